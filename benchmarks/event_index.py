@@ -0,0 +1,118 @@
+"""
+Times checking scraped rows against the known events of a target, with the fingerprint index (EventIndex)
+and with the field by field scan over the whole history that compare_events used to do.
+The scraped rows are all new, the worst case for the scan, as it has to go through the whole history for every row.
+
+Run from the bot directory with: python -m benchmarks.event_index [--sizes 10000 100000 1000000] [--rows 50]
+"""
+
+import argparse
+import time
+from typing import Dict, List, Optional
+
+from internal_tools.alto import event_fingerprint
+from internal_tools.events import ActivityEvent
+from internal_tools.history import EventIndex
+
+URL = "https://alto.build/collections/test"
+
+
+def generate_events(count: int, first_token_id: int = 0):
+    return [
+        ActivityEvent(
+            ["Sale", "Listing", "Transfer"][i % 3],
+            None,
+            str(first_token_id + i),
+            str(i % 1000),
+            f"0x{i % 5000:040x}",
+            f"0x{(i * 7) % 5000:040x}",
+            URL,
+        )
+        for i in range(count)
+    ]
+
+
+def legacy_event(event: ActivityEvent) -> Dict[str, Optional[str]]:
+    return {
+        "EVENT_TYPE": event.event_type,
+        "TOKEN_ID": event.token_id,
+        "PRICE": event.price,
+        "TO_ADDRESS": event.to_address,
+        "FROM_ADDRESS": event.from_address,
+    }
+
+
+def compare_events(event1: Dict[str, Optional[str]], event2: Dict[str, Optional[str]]):
+    # The comparison known events used to be checked with.
+    if event1["EVENT_TYPE"] != event2["EVENT_TYPE"]:
+        return False
+    elif event1["TOKEN_ID"] != event2["TOKEN_ID"]:
+        return False
+    elif event1["PRICE"] != event2["PRICE"]:
+        return False
+    elif event1["TO_ADDRESS"] != event2["TO_ADDRESS"]:
+        return False
+    elif event1["FROM_ADDRESS"] != event2["FROM_ADDRESS"]:
+        return False
+
+    return True
+
+
+def new_by_scan(
+    rows: List[Dict[str, Optional[str]]], known: List[Dict[str, Optional[str]]]
+):
+    new_rows = []
+    for row in rows:
+        for known_row in known:
+            if compare_events(row, known_row):
+                break
+        else:
+            new_rows.append(row)
+
+    return new_rows
+
+
+def new_by_index(rows: List[ActivityEvent], index: EventIndex):
+    return [row for row in rows if event_fingerprint(row) not in index]
+
+
+def benchmark(size: int, row_count: int):
+    history = generate_events(size)
+    rows = generate_events(row_count, first_token_id=size)
+
+    started = time.perf_counter()
+    index = EventIndex(history, [])
+    build_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    assert len(new_by_index(rows, index)) == row_count
+    index_seconds = time.perf_counter() - started
+
+    legacy_history = [legacy_event(event) for event in history]
+    legacy_rows = [legacy_event(event) for event in rows]
+
+    started = time.perf_counter()
+    assert len(new_by_scan(legacy_rows, legacy_history)) == row_count
+    scan_seconds = time.perf_counter() - started
+
+    print(
+        f"{size:>9} events: scan {scan_seconds * 1000:10.2f}ms, "
+        f"index {index_seconds * 1000:6.3f}ms (built once in {build_seconds * 1000:.0f}ms)"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=[10000, 100000, 1000000]
+    )
+    parser.add_argument("--rows", type=int, default=50)
+    arguments = parser.parse_args()
+
+    print(f"{arguments.rows} scraped rows")
+    for size in arguments.sizes:
+        benchmark(size, arguments.rows)
+
+
+if __name__ == "__main__":
+    main()
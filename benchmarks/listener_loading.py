@@ -0,0 +1,100 @@
+"""
+Times loading generated listener stores ({target: {guild_id: webhook_url}}) with the declared schema the tracker uses
+and with the type guessing JsonDictSaver does without one, plus loading a large generated config file.
+Everything is written to and loaded from a temporary directory.
+
+Run from the bot directory with: python -m benchmarks.listener_loading [--targets 20000] [--listeners 5]
+"""
+
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+import orjson
+
+
+def generate_listeners(targets: int, listeners_per_target: int):
+    return {
+        f"collection-{target}": {
+            str(100000000000000000 + target * listeners_per_target + i): (
+                f"https://discord.com/api/webhooks/{target}{i}/token-{target}-{i}"
+            )
+            for i in range(listeners_per_target)
+        }
+        for target in range(targets)
+    }
+
+
+def generate_config(entries: int):
+    return {
+        "ALLOWED_GUILD_IDS": [100000000000000000 + i for i in range(entries)],
+        "ENTRIES": {
+            str(i): {
+                "NAME": f"entry-{i}",
+                "COUNT": str(i),
+                "RATIO": f"{i}.5",
+                "ENABLED": "true",
+                "CREATED": "2026-10-17T14:00:00",
+            }
+            for i in range(entries)
+        },
+    }
+
+
+def timed(function):
+    started = time.perf_counter()
+    result = function()
+
+    return time.perf_counter() - started, result
+
+
+def benchmark(targets: int, listeners_per_target: int, config_entries: int):
+    # Imported here, loading the module reads config/ and creates data/ in the working directory.
+    from internal_tools.configuration import JsonDictSaver
+
+    with open("data/listeners.json", "wb") as f:
+        f.write(orjson.dumps(generate_listeners(targets, listeners_per_target)))
+
+    with open("config/BENCHMARK.json", "wb") as f:
+        f.write(orjson.dumps(generate_config(config_entries)))
+
+    guessing_seconds, guessed = timed(lambda: JsonDictSaver("listeners"))
+    schema_seconds, decoded = timed(
+        lambda: JsonDictSaver("listeners", schema=(str, int, str))
+    )
+    assert guessed.data == decoded.data
+
+    config_seconds, _ = timed(lambda: JsonDictSaver("BENCHMARK", data_type="config"))
+
+    print(
+        f"{targets} targets, {targets * listeners_per_target} listeners: "
+        f"type guessing {guessing_seconds * 1000:.0f}ms, schema {schema_seconds * 1000:.0f}ms"
+    )
+    print(
+        f"config with {config_entries} entries (type guessing): {config_seconds * 1000:.0f}ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--targets", type=int, default=20000)
+    parser.add_argument("--listeners", type=int, default=5)
+    parser.add_argument("--config-entries", type=int, default=10000)
+    arguments = parser.parse_args()
+
+    previous_directory = os.getcwd()
+    with tempfile.TemporaryDirectory() as directory:
+        shutil.copytree("config/default", os.path.join(directory, "config", "default"))
+        os.makedirs(os.path.join(directory, "data"))
+
+        os.chdir(directory)
+        try:
+            benchmark(arguments.targets, arguments.listeners, arguments.config_entries)
+        finally:
+            os.chdir(previous_directory)
+
+
+if __name__ == "__main__":
+    main()
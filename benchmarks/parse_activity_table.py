@@ -0,0 +1,109 @@
+"""
+Times parsing the activity table from one HTML snapshot (PARSE_MODE "html") against walking its cells over WebDriver.
+The table is the test fixture with its rows repeated. The WebDriver side is skipped when no browser can be started.
+
+Run from the bot directory with: python -m benchmarks.parse_activity_table [--rows 50] [--browser brave-browser]
+"""
+
+import argparse
+import os
+import time
+from urllib.parse import quote
+
+from internal_tools.alto import event_from_cells, parse_activity_table_html
+
+URL = "https://alto.build/collections/test"
+FIXTURE = os.path.join(
+    os.path.dirname(__file__), "..", "tests", "fixtures", "activity_table.html"
+)
+
+
+def activity_table(rows: int):
+    with open(FIXTURE, encoding="utf-8") as f:
+        fixture = f.read().strip()
+
+    start = fixture.index(">") + 1
+    end = fixture.rindex("</div>")
+    fixture_rows = fixture[start:end].split('<div class="row">')[1:]
+
+    return (
+        fixture[:start]
+        + "".join(
+            '<div class="row">' + fixture_rows[i % len(fixture_rows)]
+            for i in range(rows)
+        )
+        + "</div>"
+    )
+
+
+def best_of(repeat: int, function):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - started)
+
+    return min(timings)
+
+
+def benchmark_html(html: str, repeat: int):
+    seconds = best_of(repeat, lambda: parse_activity_table_html(html, URL))
+    print(f"html parse (in process):      {seconds * 1000:8.2f}ms")
+
+
+def benchmark_webdriver(html: str, repeat: int, browser_executable_path: str):
+    try:
+        import undetected_chromedriver as uc
+        from selenium.webdriver.common.by import By
+
+        from internal_tools.scraping import _webdriver_cells
+
+        driver = uc.Chrome(
+            browser_executable_path=browser_executable_path, headless=True
+        )
+    except Exception as e:
+        print(
+            f"webdriver: skipped, no browser could be started ({e.__class__.__name__})"
+        )
+        return
+
+    try:
+        driver.get("data:text/html;charset=utf-8," + quote(html))
+        table = driver.find_element(By.XPATH, "//div[@class='activity-table']")
+
+        seconds = best_of(
+            repeat,
+            lambda: [
+                event_from_cells(URL, _webdriver_cells(row))
+                for row in table.find_elements(By.XPATH, "./*")
+            ],
+        )
+        print(f"webdriver cell walk:          {seconds * 1000:8.2f}ms")
+
+        seconds = best_of(
+            repeat,
+            lambda: parse_activity_table_html(
+                str(table.get_attribute("outerHTML")), URL
+            ),
+        )
+        print(f"html parse (with outerHTML):  {seconds * 1000:8.2f}ms")
+    finally:
+        driver.quit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--browser", default="brave-browser")
+    arguments = parser.parse_args()
+
+    html = activity_table(arguments.rows)
+    print(f"{arguments.rows} rows, best of {arguments.repeat}")
+
+    benchmark_html(html, arguments.repeat)
+    benchmark_webdriver(html, arguments.repeat, arguments.browser)
+
+
+if __name__ == "__main__":
+    main()
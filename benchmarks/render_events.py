@@ -0,0 +1,100 @@
+"""
+Times turning bursts of new events into outbox entries for many listeners: rendered once and shared by every listener
+(what log_collection_events and log_wallet_events do), against rendering them again for every listener.
+The outbox only collects the entries here, nothing gets sent.
+
+Run from the bot directory with: python -m benchmarks.render_events [--listeners 10 100 1000] [--events 10 50 200]
+"""
+
+import argparse
+import time
+from typing import Any, Dict, List, Tuple
+
+from cogs.tracker import Tracker
+from internal_tools.events import ActivityEvent
+
+URL = "https://alto.build/collections/test"
+
+
+class CollectingOutbox:
+    def __init__(self) -> None:
+        self.entries = 0
+
+    def put(self, webhook_url: str, rendered: List[Tuple[str, Dict[str, Any], int]]):
+        self.entries += len(rendered)
+
+
+def generate_events(count: int):
+    return [
+        ActivityEvent(
+            "Sale",
+            f"https://cdn.alto.build/tokens/{i}.png",
+            str(i),
+            f"{i}.5",
+            f"0x{i:040x}",
+            f"0x{i * 7:040x}",
+            URL,
+        )
+        for i in range(count)
+    ]
+
+
+def tracker(listeners: int):
+    # Only what the log methods touch, without starting browsers, loops and stores.
+    tracker = Tracker.__new__(Tracker)
+    tracker.collection_event_log_listeners = {  # type: ignore
+        "test": {
+            guild_id: f"https://discord.com/api/webhooks/{guild_id}/token"
+            for guild_id in range(listeners)
+        }
+    }
+    tracker.wallet_event_log_listeners = {  # type: ignore
+        "0xabc": tracker.collection_event_log_listeners["test"]
+    }
+    tracker.outbox = CollectingOutbox()  # type: ignore
+
+    return tracker
+
+
+def timed(function):
+    started = time.perf_counter()
+    function()
+
+    return time.perf_counter() - started
+
+
+def benchmark(listeners: int, event_count: int):
+    events = generate_events(event_count)
+    shared = tracker(listeners)
+
+    once_seconds = timed(lambda: shared.log_collection_events("test", events))
+    wallet_seconds = timed(lambda: shared.log_wallet_events("0xabc", events))
+
+    def render_per_listener():
+        for _, webhook_url in shared.collection_event_log_listeners["test"].items():
+            shared.outbox.put(
+                webhook_url, shared._render_events("collection", "test", events)
+            )
+
+    per_listener_seconds = timed(render_per_listener)
+
+    print(
+        f"{listeners:>5} listeners, {event_count:>4} events: "
+        f"per listener {per_listener_seconds * 1000:9.1f}ms, "
+        f"once {once_seconds * 1000:7.1f}ms (wallet {wallet_seconds * 1000:.1f}ms)"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--listeners", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--events", type=int, nargs="+", default=[10, 50, 200])
+    arguments = parser.parse_args()
+
+    for listeners in arguments.listeners:
+        for event_count in arguments.events:
+            benchmark(listeners, event_count)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,6 @@
 import asyncio
 import logging
+import multiprocessing
 import os
 import traceback
 from typing import Union
@@ -8,12 +9,18 @@ import aiohttp
 import nextcord
 from nextcord.ext import application_checks, commands, tasks
 
-from internal_tools.configuration import CONFIG
+from internal_tools.monitoring import LoopLagMonitor
 
 
 async def main():
+    # Not imported at the top, scrape worker processes import this file too and must not load or write the config.
+    from internal_tools.configuration import CONFIG
+
     logging.basicConfig(filename="bot.log", filemode="w+", level=logging.INFO)
 
+    loop_lag_monitor = LoopLagMonitor(CONFIG["GENERAL"]["LOOP_LAG_WARNING_SECONDS"])
+    loop_lag_monitor.start()
+
     intents = nextcord.Intents.default()
     intents.members = CONFIG["GENERAL"]["MEMBERS_INTENT"]
     intents.presences = CONFIG["GENERAL"]["PRESENCE_INTENT"]
@@ -298,8 +305,13 @@ async def main():
                 text = "".join(traceback.format_exception(type(original_exception), original_exception, original_exception.__traceback__))  # type: ignore
                 await webhook.send(f"Unpredicted Error:\n```\n{text}\n```")
 
-    await bot.start(CONFIG["GENERAL"]["TOKEN"])
+    try:
+        await bot.start(CONFIG["GENERAL"]["TOKEN"])
+    finally:
+        loop_lag_monitor.stop()
 
 
 if __name__ == "__main__":
+    multiprocessing.freeze_support()  # Scrape workers are separate processes, needed for pyinstaller builds
+
     asyncio.run(main())
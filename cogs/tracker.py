@@ -1,31 +1,177 @@
 import asyncio
-import time
-from typing import Dict, List, Union
+import logging
+from typing import Any, Container, Dict, List, Literal, Optional, Set, Tuple, Union
 import aiohttp
 
 import nextcord
-import undetected_chromedriver as uc
 from nextcord.ext import commands, tasks
-from selenium.webdriver.common.by import By
 
+from internal_tools.alto import (
+    EventFingerprint,
+    event_fingerprint,
+    fetch_activity_http,
+)
+from internal_tools.browser import prepare_chromedriver
+from internal_tools.caching import ResultCache
 from internal_tools.configuration import CONFIG, JsonDictSaver
+from internal_tools.delivery import WebhookDelivery
 from internal_tools.discord import *
+from internal_tools.events import ActivityEvent
+from internal_tools.history import EventHistory, fingerprint_digest
+from internal_tools.outbox import Outbox
+from internal_tools.scheduler import PollScheduler
+from internal_tools.storage import SqliteDatabase, SqliteListenerSaver
+from internal_tools.workers import ScrapeWorkerPool
 
 
 class Tracker(commands.Cog):
     def __init__(self, bot: commands.Bot):
         self.bot = bot
 
-        self.collection_events = JsonDictSaver(
-            "collection_events", auto_convert_data=False
+        self.database: Optional[SqliteDatabase] = None
+        if CONFIG["ALTO_TRACKER"]["STORAGE"]["ENGINE"] == "sqlite":
+            self.database = SqliteDatabase(
+                CONFIG["ALTO_TRACKER"]["STORAGE"]["SQLITE_PATH"]
+            )
+
+        self.collection_history = EventHistory(
+            "collection",
+            CONFIG["ALTO_TRACKER"]["EVENT_RETENTION"]["MAX_EVENTS_PER_TARGET"],
+            CONFIG["ALTO_TRACKER"]["EVENT_RETENTION"]["MAX_AGE_DAYS"],
+            CONFIG["ALTO_TRACKER"]["EVENT_RETENTION"]["MAX_DIGESTS_PER_TARGET"],
+            CONFIG["ALTO_TRACKER"]["EVENT_RETENTION"]["COMPACT_AFTER_RECORDS"],
+            CONFIG["ALTO_TRACKER"]["STORAGE"]["MAX_LOADED_TARGETS"],
+            self.database,
+        )
+        self.wallet_history = EventHistory(
+            "wallet",
+            CONFIG["ALTO_TRACKER"]["EVENT_RETENTION"]["MAX_EVENTS_PER_TARGET"],
+            CONFIG["ALTO_TRACKER"]["EVENT_RETENTION"]["MAX_AGE_DAYS"],
+            CONFIG["ALTO_TRACKER"]["EVENT_RETENTION"]["MAX_DIGESTS_PER_TARGET"],
+            CONFIG["ALTO_TRACKER"]["EVENT_RETENTION"]["COMPACT_AFTER_RECORDS"],
+            CONFIG["ALTO_TRACKER"]["STORAGE"]["MAX_LOADED_TARGETS"],
+            self.database,
+        )
+
+        self.collection_event_log_listeners: Union[JsonDictSaver, SqliteListenerSaver]
+        self.wallet_event_log_listeners: Union[JsonDictSaver, SqliteListenerSaver]
+        if self.database == None:
+            self.collection_event_log_listeners = JsonDictSaver(
+                "collection_event_log_listeners",
+                schema=(str, int, str),
+                write_behind_seconds=CONFIG["ALTO_TRACKER"]["STORAGE"][
+                    "SAVE_INTERVAL_SECONDS"
+                ],
+            )
+            self.wallet_event_log_listeners = JsonDictSaver(
+                "wallet_event_log_listeners",
+                schema=(str, int, str),
+                write_behind_seconds=CONFIG["ALTO_TRACKER"]["STORAGE"][
+                    "SAVE_INTERVAL_SECONDS"
+                ],
+            )
+        else:
+            self.collection_event_log_listeners = SqliteListenerSaver(
+                self.database, "collection_event_log_listeners"
+            )
+            self.wallet_event_log_listeners = SqliteListenerSaver(
+                self.database, "wallet_event_log_listeners"
+            )
+
+        try:
+            driver_executable_path = prepare_chromedriver(
+                CONFIG["ALTO_TRACKER"]["BROWSER_CACHE"]["DRIVER_DIRECTORY"]
+            )
+        except Exception as e:
+            # Browsers can still start without it, they just patch their own driver every launch.
+            logging.warning(f"Couldnt cache a patched chromedriver: {e}")
+            driver_executable_path = None
+
+        self.scrape_workers = ScrapeWorkerPool(
+            CONFIG["ALTO_TRACKER"]["SCRAPE_WORKERS"]["COUNT"],
+            CONFIG["ALTO_TRACKER"]["SCRAPE_WORKERS"]["MAX_PAGES_PER_WORKER"],
+            CONFIG["ALTO_TRACKER"]["SCRAPE_WORKERS"]["MAX_RSS_MB"],
+            CONFIG["ALTO_TRACKER"]["SCRAPE_WORKERS"]["TIMEOUT_SECONDS"],
+            {
+                "MAX_PAGES_PER_WORKER": CONFIG["ALTO_TRACKER"]["SCRAPE_WORKERS"][
+                    "MAX_PAGES_PER_WORKER"
+                ],
+                "SELECTORS": CONFIG["ALTO_TRACKER"]["SELECTORS"],
+                "LEAN_PROFILE": CONFIG["ALTO_TRACKER"]["LEAN_PROFILE"],
+                "DRIVER_EXECUTABLE_PATH": driver_executable_path,
+                "PROFILE_DIRECTORY": CONFIG["ALTO_TRACKER"]["BROWSER_CACHE"][
+                    "PROFILE_DIRECTORY"
+                ],
+                "MAX_PROFILE_MB": CONFIG["ALTO_TRACKER"]["BROWSER_CACHE"][
+                    "MAX_PROFILE_MB"
+                ],
+                "PARSE_MODE": CONFIG["ALTO_TRACKER"]["PARSE_MODE"],
+                "PAGE_READY_TIMEOUT_SECONDS": CONFIG["ALTO_TRACKER"][
+                    "PAGE_READY_TIMEOUT_SECONDS"
+                ],
+            },
+        )
+
+        self.http_session: Optional[aiohttp.ClientSession] = None
+        self.delivery = WebhookDelivery(
+            self._get_http_session,
+            CONFIG["ALTO_TRACKER"]["DELIVERY"]["MAX_CONCURRENT_REQUESTS"],
+            CONFIG["ALTO_TRACKER"]["DELIVERY"]["MAX_ATTEMPTS"],
+        )
+        self.outbox = Outbox(
+            "webhook_outbox",
+            self.delivery,
+            lambda: {
+                "username": self.bot.user.name,  # type: ignore
+                "avatar_url": str(self.bot.user.display_avatar.url),  # type: ignore
+            },
+            CONFIG["ALTO_TRACKER"]["DELIVERY"]["MAX_BACKOFF_SECONDS"],
+            CONFIG["ALTO_TRACKER"]["EVENT_RETENTION"]["COMPACT_AFTER_RECORDS"],
+        )
+
+        self.scrape_cache: ResultCache[
+            Tuple[str, Optional[EventFingerprint]], List[ActivityEvent]
+        ] = ResultCache(
+            CONFIG["ALTO_TRACKER"]["SCRAPE_CACHE"]["TTL_SECONDS"],
+            CONFIG["ALTO_TRACKER"]["SCRAPE_CACHE"]["MAX_ENTRIES"],
         )
-        self.collection_event_log_listeners = JsonDictSaver(
-            "collection_event_log_listeners"
+
+        self.scrape_limit = asyncio.Semaphore(
+            CONFIG["ALTO_TRACKER"]["MAX_CONCURRENT_SCRAPES"]
+        )
+        self.scheduler: PollScheduler[Tuple[Literal["collection", "wallet"], str]] = (
+            PollScheduler(
+                CONFIG["ALTO_TRACKER"]["UPDATE_LOOP_MINUTES"] * 60,
+                CONFIG["ALTO_TRACKER"]["SCHEDULER"]["MIN_INTERVAL_MINUTES"] * 60,
+                CONFIG["ALTO_TRACKER"]["SCHEDULER"]["MAX_INTERVAL_MINUTES"] * 60,
+                CONFIG["ALTO_TRACKER"]["SCHEDULER"]["BACKOFF_FACTOR"],
+                CONFIG["ALTO_TRACKER"]["SCHEDULER"]["JITTER_SECONDS"],
+                CONFIG["ALTO_TRACKER"]["SCHEDULER"]["SCRAPES_PER_MINUTE"],
+            )
         )
-        self.wallet_events = JsonDictSaver("wallet_events", auto_convert_data=False)
-        self.wallet_event_log_listeners = JsonDictSaver("wallet_event_log_listeners")
+        self.running_updates: Set[asyncio.Task] = set()
 
         self.update_data.start()
+        self.compact_events.start()
+
+    def cog_unload(self):
+        self.update_data.cancel()
+        self.compact_events.cancel()
+        self.collection_event_log_listeners.flush()
+        self.wallet_event_log_listeners.flush()
+        self.collection_history.close()
+        self.wallet_history.close()
+        if self.database != None:
+            self.database.close()
+        for task in self.running_updates:
+            task.cancel()
+
+        self.scrape_workers.close()
+        self.outbox.close()
+        self.delivery.close()
+
+        if self.http_session != None:
+            asyncio.get_event_loop().create_task(self.http_session.close())
 
     async def cog_application_command_check(self, interaction: nextcord.Interaction):
         """
@@ -33,270 +179,272 @@ class Tracker(commands.Cog):
         """
         return True
 
-    def compare_events(
-        self, event1: Dict[str, Union[str, None]], event2: Dict[str, Union[str, None]]
+    def _filter_new_events(
+        self,
+        entries: List[ActivityEvent],
+        known: Container[EventFingerprint],
     ):
-        if event1["EVENT_TYPE"] != event2["EVENT_TYPE"]:
-            return False
-        elif event1["TOKEN_ID"] != event2["TOKEN_ID"]:
-            return False
-        elif event1["PRICE"] != event2["PRICE"]:
-            return False
-        elif event1["TO_ADDRESS"] != event2["TO_ADDRESS"]:
-            return False
-        elif event1["FROM_ADDRESS"] != event2["FROM_ADDRESS"]:
-            return False
+        """
+        Drops already known events and returns the rest oldest first.
+        """
+        return [
+            entry_data
+            for entry_data in reversed(entries)
+            if event_fingerprint(entry_data) not in known
+        ]
 
-        return True
+    def _get_http_session(self):
+        """
+        The session everything in this cog uses, for page fetches and webhooks alike, so connections get reused.
+        """
+        if self.http_session == None or self.http_session.closed:
+            self.http_session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(
+                    limit=CONFIG["ALTO_TRACKER"]["HTTP_SESSION"]["CONNECTION_LIMIT"],
+                    ttl_dns_cache=CONFIG["ALTO_TRACKER"]["HTTP_SESSION"][
+                        "DNS_CACHE_SECONDS"
+                    ],
+                    keepalive_timeout=CONFIG["ALTO_TRACKER"]["HTTP_SESSION"][
+                        "KEEPALIVE_SECONDS"
+                    ],
+                )
+            )
+
+        return self.http_session
 
-    def _scrape_data(
-        self, url: str, known_entries: List[Dict[str, Union[str, None]]] = []
+    async def _fetch_activity(
+        self, url: str, watermark: Optional[EventFingerprint] = None
     ):
-        new_data: List[Dict[str, str | None]] = []
-        error = None
+        """
+        Gets the activity of a collection or wallet page, newest first, together with the error if it failed.
+        Recent results are shared, a full scrape (without watermark) can answer every caller for the same page.
+        """
+        cached = self.scrape_cache.get((url, None))
+        if cached != None:
+            return cached, None
 
-        driver = uc.Chrome(browser_executable_path="brave-browser", headless=True)
         try:
-            driver.get(url)
-            time.sleep(2)
-
-            driver.find_element(
-                By.XPATH, CONFIG["ALTO_TRACKER"]["SELECTORS"]["ACTIVITY_TAB"]
-            ).click()
-            time.sleep(3)
-
-            table = driver.find_element(
-                By.XPATH, CONFIG["ALTO_TRACKER"]["SELECTORS"]["ACTIVITY_TABLE"]
+            entries = await self.scrape_cache.get_or_run(
+                (url, watermark), lambda: self._fetch_activity_uncached(url, watermark)
             )
-            for entry in reversed(table.find_elements(By.XPATH, "./*")):
-                entry_data_raw = entry.find_elements(By.XPATH, "./*")
-                entry_data = {}
-
-                entry_data["EVENT_TYPE"] = entry_data_raw[0].text
-
-                try:
-                    entry_data["PREVIEW_IMAGE_URL"] = (
-                        entry_data_raw[1]
-                        .find_element(By.XPATH, ".//img")
-                        .get_attribute("src")
-                    )
-                except:
-                    entry_data["PREVIEW_IMAGE_URL"] = None
-
-                entry_data["TOKEN_ID"] = entry_data_raw[1].text
-
-                entry_data["TOKEN_URL"] = url + "/" + str(entry_data["TOKEN_ID"])
-
-                if entry_data_raw[2].text != "--":
-                    entry_data["PRICE"] = entry_data_raw[2].text.replace("\nCANTO", "")
-                else:
-                    entry_data["PRICE"] = None
-
-                if entry_data_raw[3].text != "--":
-                    entry_data["TO_ADDRESS_URL"] = (
-                        entry_data_raw[3]
-                        .find_element(By.XPATH, "./a")
-                        .get_attribute("href")
-                    )
-
-                    if entry_data["TO_ADDRESS_URL"] == None:
-                        raise Exception("Couldnt parse receiving wallet address")
-
-                    entry_data["TO_ADDRESS"] = entry_data["TO_ADDRESS_URL"].rsplit(
-                        "/", 1
-                    )[1]
-                else:
-                    entry_data["TO_ADDRESS"] = None
-                    entry_data["TO_ADDRESS_URL"] = None
-
-                if (
-                    entry_data_raw[4].text != "--"
-                    and entry_data_raw[4].text != "null address"
-                ):
-                    entry_data["FROM_ADDRESS_URL"] = (
-                        entry_data_raw[4]
-                        .find_element(By.XPATH, "./a")
-                        .get_attribute("href")
-                    )
-
-                    if entry_data["FROM_ADDRESS_URL"] == None:
-                        raise Exception("Couldnt parse sending wallet address")
-
-                    entry_data["FROM_ADDRESS"] = entry_data["FROM_ADDRESS_URL"].rsplit(
-                        "/", 1
-                    )[1]
-                else:
-                    entry_data["FROM_ADDRESS"] = None
-                    entry_data["FROM_ADDRESS_URL"] = None
-
-                for known_entry in known_entries:
-                    if self.compare_events(entry_data, known_entry):
-                        break
-                else:
-                    new_data.append(entry_data)
         except Exception as e:
-            error = e
+            return [], e
 
-        finally:
-            try:
-                driver.close()
-            except:
-                pass
+        return entries, None
 
+    async def _fetch_activity_uncached(
+        self, url: str, watermark: Optional[EventFingerprint]
+    ):
+        """
+        Tries the plain HTTP fetch first and only uses a browser when that fails.
+        """
+        if CONFIG["ALTO_TRACKER"]["HTTP_FETCH"]["ENABLED"]:
             try:
-                driver.quit()
-            except:
-                pass
+                return await fetch_activity_http(
+                    self._get_http_session(),
+                    url,
+                    CONFIG["ALTO_TRACKER"]["HTTP_FETCH"]["FIELDS"],
+                    CONFIG["ALTO_TRACKER"]["HTTP_FETCH"]["TIMEOUT_SECONDS"],
+                    watermark,
+                )
+            except Exception as e:
+                logging.info(f"HTTP fetch of {url} failed, using the browser: {e}")
+
+        entries, ready_seconds, error_text = await self.scrape_workers.scrape(
+            url, watermark
+        )
 
-            del driver
+        if error_text != None:
+            raise Exception(f"Scraping {url} failed:\n{error_text}")
 
-            return new_data, error
+        if ready_seconds != None:
+            logging.info(f"Activity table of {url} ready after {ready_seconds:.2f}s")
+        else:
+            logging.info(f"Activity table of {url} did not fill up in time")
+
+        return entries
 
     async def get_new_collection_events(
         self,
         collection_name: str,
-        known_events: List[Dict[str, Union[str, None]]] = [],
+        known: Container[EventFingerprint] = set(),
+        watermark: Optional[EventFingerprint] = None,
     ):
-        loop = asyncio.get_running_loop()
-
-        new_events, error = await loop.run_in_executor(
-            None,
-            self._scrape_data,
+        entries, error = await self._fetch_activity(
             CONFIG["ALTO_TRACKER"]["MARKETPLACE_BASE_URL"]
             + "collections/"
             + collection_name,
-            known_events,
+            watermark,
         )
 
         if error != None:
-            await log_error_in_discord(error)
+            await log_error_in_discord(error, self._get_http_session())
 
-        return new_events
+        return self._filter_new_events(entries, known)
 
     async def get_new_wallet_events(
         self,
         wallet: str,
-        known_events: List[Dict[str, Union[str, None]]] = [],
+        known: Container[EventFingerprint] = set(),
+        watermark: Optional[EventFingerprint] = None,
     ):
-        loop = asyncio.get_running_loop()
-        new_events, error = await loop.run_in_executor(
-            None,
-            self._scrape_data,
+        entries, error = await self._fetch_activity(
             CONFIG["ALTO_TRACKER"]["MARKETPLACE_BASE_URL"] + "profile/" + wallet,
-            known_events,
+            watermark,
         )
 
-        return new_events, error
+        if error != None:
+            await log_error_in_discord(error, self._get_http_session())
+
+        return self._filter_new_events(entries, known)
+
+    def _render_events(
+        self,
+        kind: Literal["collection", "wallet"],
+        target: str,
+        events: List[ActivityEvent],
+    ):
+        """
+        Turns events into (digest, embed dict, character count) entries for the outbox.
+        Done once per batch of events, every listener gets the same entries.
+        The digest includes where the event was found, a webhook can listen to the same event through several targets.
+        """
+        rendered: List[Tuple[str, Dict[str, Any], int]] = []
+        for event in events:
+            fields = {}
+
+            if event.price != None:
+                fields["Price"] = f"{event.price} CANTO"
+
+            if event.from_address != None:
+                fields["From Address"] = (
+                    f"[{event.from_address}]({event.from_address_url})"
+                )
+
+            if event.to_address != None:
+                fields["To Address"] = f"[{event.to_address}]({event.to_address_url})"
+
+            fields["Alto URL to Token"] = f"[Link]({event.token_url})"
+
+            embed = fancy_embed(
+                title=event.event_type,
+                fields=fields,
+                thumbnail_url=event.preview_image_url,
+            )
+            rendered.append(
+                (
+                    f"{kind}:{target}:{fingerprint_digest(event_fingerprint(event))}",
+                    dict(embed.to_dict()),
+                    len(embed),
+                )
+            )
+
+        return rendered
 
-    async def log_collection_events(
+    def log_collection_events(
         self,
         collection_name: str,
-        events: List[Dict[str, Union[str, None]]],
+        events: List[ActivityEvent],
     ):
+        rendered = self._render_events("collection", collection_name, events)
+
         for _, webhook_url in self.collection_event_log_listeners[
             collection_name
         ].items():
-            async with aiohttp.ClientSession() as session:
-                try:
-                    webhook = nextcord.Webhook.from_url(webhook_url, session=session)
-                except:
-                    continue
-
-                for event in events:
-                    fields = {}
-
-                    if event["PRICE"] != None:
-                        fields["Price"] = f"{event['PRICE']} CANTO"
-
-                    if event["FROM_ADDRESS"] != None:
-                        fields[
-                            "From Address"
-                        ] = f"[{event['FROM_ADDRESS']}]({event['FROM_ADDRESS_URL']})"
-
-                    if event["TO_ADDRESS"] != None:
-                        fields[
-                            "To Address"
-                        ] = f"[{event['TO_ADDRESS']}]({event['TO_ADDRESS_URL']})"
-
-                    fields["Alto URL to Token"] = f"[Link]({event['TOKEN_URL']})"
-
-                    embed = fancy_embed(
-                        title=str(event["EVENT_TYPE"]),
-                        fields=fields,
-                        thumbnail_url=event["PREVIEW_IMAGE_URL"],
-                    )
-                    await webhook.send(embed=embed, username=self.bot.user.name, avatar_url=self.bot.user.display_avatar.url)  # type: ignore
-
-    async def log_wallet_events(
+            self.outbox.put(webhook_url, rendered)
+
+    def log_wallet_events(
         self,
         wallet: str,
-        events: List[Dict[str, Union[str, None]]],
+        events: List[ActivityEvent],
     ):
+        # Same embeds as for collections, with the tracked wallet as first field on top.
+        wallet_field = {"name": "Wallet tracked", "value": wallet, "inline": False}
+        rendered = [
+            (
+                digest,
+                dict(embed, fields=[wallet_field] + embed.get("fields", [])),
+                length + len(wallet_field["name"]) + len(wallet),
+            )
+            for digest, embed, length in self._render_events("wallet", wallet, events)
+        ]
+
         for _, webhook_url in self.wallet_event_log_listeners[wallet].items():
-            async with aiohttp.ClientSession() as session:
-                try:
-                    webhook = nextcord.Webhook.from_url(webhook_url, session=session)
-                except:
-                    continue
-
-                for event in events:
-                    fields = {"Wallet tracked": wallet}
-
-                    if event["PRICE"] != None:
-                        fields["Price"] = f"{event['PRICE']} CANTO"
-
-                    if event["FROM_ADDRESS"] != None:
-                        fields[
-                            "From Address"
-                        ] = f"[{event['FROM_ADDRESS']}]({event['FROM_ADDRESS_URL']})"
-
-                    if event["TO_ADDRESS"] != None:
-                        fields[
-                            "To Address"
-                        ] = f"[{event['TO_ADDRESS']}]({event['TO_ADDRESS_URL']})"
-
-                    fields["Alto URL to Token"] = f"[Link]({event['TOKEN_URL']})"
-
-                    embed = fancy_embed(
-                        title=str(event["EVENT_TYPE"]),
-                        fields=fields,
-                        thumbnail_url=event["PREVIEW_IMAGE_URL"],
-                    )
-                    await webhook.send(embed=embed, username=self.bot.user.name, avatar_url=self.bot.user.display_avatar.url)  # type: ignore
-
-    @tasks.loop(minutes=CONFIG["ALTO_TRACKER"]["UPDATE_LOOP_MINUTES"])
-    async def update_data(self):
-        for collection_name in self.collection_event_log_listeners.copy():
-            known_events = self.collection_events[collection_name].copy()
+            self.outbox.put(webhook_url, rendered)
 
+    async def update_collection(self, collection_name: str):
+        async with self.scrape_limit:
             new_events = await self.get_new_collection_events(
-                collection_name, known_events
+                collection_name,
+                self.collection_history.known(collection_name),
+                self.collection_history.watermark(collection_name),
             )
 
-            try:
-                await self.log_collection_events(collection_name, new_events)
-            except:
-                pass
+        self.log_collection_events(collection_name, new_events)
 
-            known_events.extend(new_events)
+        self.collection_history.remember(collection_name, new_events)
 
-            self.collection_events[collection_name] = known_events
-            self.collection_events.save()
+        return len(new_events) > 0
 
-        for wallet in self.wallet_event_log_listeners.copy():
-            known_events = self.wallet_events[wallet].copy()
+    async def update_wallet(self, wallet: str):
+        async with self.scrape_limit:
+            new_events = await self.get_new_wallet_events(
+                wallet,
+                self.wallet_history.known(wallet),
+                self.wallet_history.watermark(wallet),
+            )
 
-            new_events, error = await self.get_new_wallet_events(wallet, known_events)
+        self.log_wallet_events(wallet, new_events)
 
-            try:
-                await self.log_wallet_events(wallet, new_events)
-            except:
-                pass
+        self.wallet_history.remember(wallet, new_events)
+
+        return len(new_events) > 0
+
+    async def _run_update(self, kind: Literal["collection", "wallet"], target: str):
+        had_new_events = False
+        try:
+            if kind == "collection":
+                had_new_events = await self.update_collection(target)
+            else:
+                had_new_events = await self.update_wallet(target)
+        except Exception as e:
+            await log_error_in_discord(e, self._get_http_session())
+        finally:
+            self.scheduler.report((kind, target), had_new_events)
+
+    @tasks.loop(seconds=CONFIG["ALTO_TRACKER"]["SCHEDULER"]["TICK_SECONDS"])
+    async def update_data(self):
+        self.outbox.resume()
+
+        targets: List[Tuple[Literal["collection", "wallet"], str]] = [
+            ("collection", collection_name)
+            for collection_name in self.collection_event_log_listeners
+        ]
+        targets.extend(("wallet", wallet) for wallet in self.wallet_event_log_listeners)
+        self.scheduler.sync(targets)
+
+        for kind, target in self.scheduler.pop_due():
+            task = asyncio.create_task(self._run_update(kind, target))
 
-            known_events.extend(new_events)
+            self.running_updates.add(task)
+            task.add_done_callback(self.running_updates.discard)
 
-            self.wallet_events[wallet] = known_events
-            self.wallet_events.save()
+    @update_data.before_loop
+    async def before_update_data(self):
+        # Waiting deliveries need the bot user for the name and avatar of their messages.
+        await self.bot.wait_until_ready()
+
+    @tasks.loop(
+        hours=CONFIG["ALTO_TRACKER"]["EVENT_RETENTION"]["COMPACTION_INTERVAL_HOURS"]
+    )
+    async def compact_events(self):
+        if self.compact_events.current_loop == 0:
+            # Skipped at startup, loading the cog shouldnt go through every target.
+            return
+
+        await self.collection_history.compact()
+        await self.wallet_history.compact()
+        self.outbox.compact()
 
     @nextcord.slash_command(
         "add-collection",
@@ -331,27 +479,26 @@ class Tracker(commands.Cog):
             await interaction.send("You provided an invalid link for the collection.")
             return
 
-        async with aiohttp.ClientSession() as session:
-            try:
-                webhook = nextcord.Webhook.from_url(webhook_url, session=session)
-                await webhook.send(
-                    embed=fancy_embed("Testing", description="Testing the Webhook"), username=self.bot.user.name, avatar_url=self.bot.user.display_avatar.url  # type: ignore
-                )
-            except:
-                await interaction.send("You provided an invalid Webhook URL.")
-                return
+        try:
+            webhook = nextcord.Webhook.from_url(
+                webhook_url, session=self._get_http_session()
+            )
+            await webhook.send(
+                embed=fancy_embed("Testing", description="Testing the Webhook"), username=self.bot.user.name, avatar_url=self.bot.user.display_avatar.url  # type: ignore
+            )
+        except:
+            await interaction.send("You provided an invalid Webhook URL.")
+            return
 
         if collection_name not in self.collection_event_log_listeners:
             self.collection_event_log_listeners[collection_name] = {}
-            self.collection_event_log_listeners.save()
 
         self.collection_event_log_listeners[collection_name][
             interaction.guild_id
         ] = webhook_url
         self.collection_event_log_listeners.save()
 
-        self.collection_events[collection_name] = initial_events
-        self.collection_events.save()
+        self.collection_history.reset(collection_name, initial_events)
 
         await interaction.send(f"Logger is set up for: {collection_link}")
 
@@ -388,25 +535,24 @@ class Tracker(commands.Cog):
             await interaction.send("You provided an invalid link for the profile.")
             return
 
-        async with aiohttp.ClientSession() as session:
-            try:
-                webhook = nextcord.Webhook.from_url(webhook_url, session=session)
-                await webhook.send(
-                    embed=fancy_embed("Testing", description="Testing the Webhook"), username=self.bot.user.name, avatar_url=self.bot.user.display_avatar.url  # type: ignore
-                )
-            except:
-                await interaction.send("You provided an invalid Webhook URL.")
-                return
+        try:
+            webhook = nextcord.Webhook.from_url(
+                webhook_url, session=self._get_http_session()
+            )
+            await webhook.send(
+                embed=fancy_embed("Testing", description="Testing the Webhook"), username=self.bot.user.name, avatar_url=self.bot.user.display_avatar.url  # type: ignore
+            )
+        except:
+            await interaction.send("You provided an invalid Webhook URL.")
+            return
 
         if wallet not in self.wallet_event_log_listeners:
             self.wallet_event_log_listeners[wallet] = {}
-            self.wallet_event_log_listeners.save()
 
         self.wallet_event_log_listeners[wallet][interaction.guild_id] = webhook_url
         self.wallet_event_log_listeners.save()
 
-        self.wallet_events[wallet] = initial_events
-        self.wallet_events.save()
+        self.wallet_history.reset(wallet, initial_events)
 
         await interaction.send(f"Logger is set up for: {wallet_link}")
 
@@ -483,7 +629,7 @@ class Tracker(commands.Cog):
             return
 
         CONFIG["ALTO_TRACKER"]["ALLOWED_GUILD_IDS"].append(guild_id)
-        CONFIG.save()
+        await CONFIG.save_async()
 
         await interaction.send("Done, added this Guild to the allow list.")
 
@@ -503,7 +649,7 @@ class Tracker(commands.Cog):
             return
 
         CONFIG["ALTO_TRACKER"]["ALLOWED_GUILD_IDS"].remove(guild_id)
-        CONFIG.save()
+        await CONFIG.save_async()
 
         await interaction.send("Done, removed this Guild from the allow list.")
 
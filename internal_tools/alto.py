@@ -0,0 +1,409 @@
+import re
+from html.parser import HTMLParser
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+from urllib.parse import urljoin
+
+import aiohttp
+import orjson
+
+from internal_tools.events import ActivityEvent
+
+__all__ = [
+    "EventFingerprint",
+    "event_fingerprint",
+    "fingerprint_index",
+    "until_watermark",
+    "ActivityCell",
+    "event_from_cells",
+    "parse_activity_table_html",
+    "fetch_activity_http",
+]
+
+_VOID_TAGS = {
+    "area",
+    "base",
+    "br",
+    "col",
+    "embed",
+    "hr",
+    "img",
+    "input",
+    "link",
+    "meta",
+    "param",
+    "source",
+    "track",
+    "wbr",
+}
+_INLINE_TAGS = {
+    "a",
+    "abbr",
+    "b",
+    "bdi",
+    "bdo",
+    "code",
+    "em",
+    "i",
+    "img",
+    "label",
+    "mark",
+    "s",
+    "small",
+    "span",
+    "strong",
+    "sub",
+    "sup",
+    "svg",
+    "path",
+    "time",
+    "u",
+}
+_WHITESPACE = re.compile(r"\s+")
+_HIDDEN_STYLE = re.compile(
+    r"(display\s*:\s*none|visibility\s*:\s*hidden)", re.IGNORECASE
+)
+_PRICE_UNIT = re.compile(r"\s*CANTO$")
+_NEXT_DATA = re.compile(
+    r'<script id="__NEXT_DATA__" type="application/json"[^>]*>(.*?)</script>',
+    re.DOTALL,
+)
+
+EventFingerprint = Tuple[
+    Optional[str], Optional[str], Optional[str], Optional[str], Optional[str]
+]
+
+
+def event_fingerprint(event: ActivityEvent) -> EventFingerprint:
+    """
+    The fields that make two events the same event.
+    """
+    return (
+        event.event_type,
+        event.token_id,
+        event.price,
+        event.to_address,
+        event.from_address,
+    )
+
+
+def fingerprint_index(events: Iterable[ActivityEvent]):
+    index: Set[EventFingerprint] = set()
+    for event in events:
+        index.add(event_fingerprint(event))
+
+    return index
+
+
+def until_watermark(
+    events: Iterable[ActivityEvent], watermark: Optional[EventFingerprint]
+) -> Iterator[ActivityEvent]:
+    """
+    Yields events (newest first) until the one matching the watermark, which is the newest already known event.
+    Without a watermark, or if it never shows up, every event is yielded.
+    """
+    for event in events:
+        if watermark != None and event_fingerprint(event) == watermark:
+            return
+
+        yield event
+
+
+class ActivityCell:
+    """
+    The parts of one activity table cell the tracker cares about.
+    """
+
+    __slots__ = ("text", "image_url", "link_url")
+
+    def __init__(
+        self,
+        text: str,
+        image_url: Optional[str] = None,
+        link_url: Optional[str] = None,
+    ) -> None:
+        self.text = text
+        self.image_url = image_url
+        self.link_url = link_url
+
+
+def event_from_cells(url: str, cells: List[ActivityCell]):
+    """
+    Turns the cells of one activity table row into an event.
+    """
+    if cells[2].text != "--":
+        # The unit is on its own line in the browser, the html parser can only guess lines and might glue it on.
+        price = _PRICE_UNIT.sub("", cells[2].text)
+    else:
+        price = None
+
+    to_address = None
+    if cells[3].text != "--":
+        if cells[3].link_url == None:
+            raise Exception("Couldnt parse receiving wallet address")
+
+        to_address = cells[3].link_url.rsplit("/", 1)[1]
+
+    from_address = None
+    if cells[4].text != "--" and cells[4].text != "null address":
+        if cells[4].link_url == None:
+            raise Exception("Couldnt parse sending wallet address")
+
+        from_address = cells[4].link_url.rsplit("/", 1)[1]
+
+    return ActivityEvent(
+        cells[0].text,
+        cells[1].image_url,
+        cells[1].text,
+        price,
+        to_address,
+        from_address,
+        url,
+    )
+
+
+class _WatermarkReached(Exception):
+    pass
+
+
+class _ActivityTableParser(HTMLParser):
+    """
+    Splits the outerHTML of the activity table into rows of cells.
+    Depth 0 is the table itself, depth 1 are the rows and depth 2 the cells.
+
+    Line breaks are guessed from tag names and only elements hidden by the hidden attribute or an inline style are skipped,
+    the text can differ from what the browser renders when the page hides or lays out things through its stylesheets.
+    """
+
+    def __init__(self, url: str, watermark: Optional[EventFingerprint]) -> None:
+        super().__init__()
+
+        self.url = url
+        self.watermark = watermark
+        self.events: List[ActivityEvent] = []
+
+        self._depth = -1
+        self._row: List[ActivityCell] = []
+        self._text: List[str] = []
+        self._image_url: Optional[str] = None
+        self._link_url: Optional[str] = None
+        self._hidden_depth: Optional[int] = None
+
+    def _in_cell(self):
+        return self._depth >= 2
+
+    def _is_hidden(self, attrs: List[Tuple[str, Optional[str]]]):
+        attributes = dict(attrs)
+        if "hidden" in attributes:
+            return True
+
+        return _HIDDEN_STYLE.search(attributes.get("style") or "") != None
+
+    def _handle_tag(self, tag: str, attrs: List[Tuple[str, Optional[str]]]):
+        if not self._in_cell() or self._hidden_depth != None or self._is_hidden(attrs):
+            return
+
+        if tag not in _INLINE_TAGS:
+            self._text.append("\n")
+
+        if tag == "img" and self._image_url == None:
+            src = dict(attrs).get("src")
+            if src:
+                self._image_url = urljoin(self.url, src)
+
+        elif tag == "a" and self._depth == 2 and self._link_url == None:
+            href = dict(attrs).get("href")
+            if href:
+                self._link_url = urljoin(self.url, href)
+
+    def handle_starttag(self, tag: str, attrs: List[Tuple[str, Optional[str]]]):
+        self._handle_tag(tag, attrs)
+
+        if tag not in _VOID_TAGS:
+            self._depth += 1
+
+            if self._depth == 1:
+                self._row = []
+            elif self._depth == 2:
+                self._text = []
+                self._image_url = None
+                self._link_url = None
+            elif (
+                self._depth > 2
+                and self._hidden_depth == None
+                and self._is_hidden(attrs)
+            ):
+                self._hidden_depth = self._depth
+
+    def handle_startendtag(self, tag: str, attrs: List[Tuple[str, Optional[str]]]):
+        self._handle_tag(tag, attrs)
+
+    def handle_endtag(self, tag: str):
+        if tag in _VOID_TAGS:
+            return
+
+        if self._depth == 2:
+            lines = [
+                _WHITESPACE.sub(" ", line).strip()
+                for line in "".join(self._text).split("\n")
+            ]
+            self._row.append(
+                ActivityCell(
+                    "\n".join(line for line in lines if line),
+                    self._image_url,
+                    self._link_url,
+                )
+            )
+        elif self._depth == 1:
+            event = event_from_cells(self.url, self._row)
+            if self.watermark != None and event_fingerprint(event) == self.watermark:
+                raise _WatermarkReached()
+
+            self.events.append(event)
+        elif self._in_cell() and tag not in _INLINE_TAGS:
+            self._text.append("\n")
+
+        if self._depth == self._hidden_depth:
+            self._hidden_depth = None
+
+        self._depth -= 1
+
+    def handle_data(self, data: str):
+        if self._in_cell() and self._hidden_depth == None:
+            self._text.append(data)
+
+
+def parse_activity_table_html(
+    html: str, url: str, watermark: Optional[EventFingerprint] = None
+):
+    """
+    Parses a snapshot of the activity table into events, in the order of the table (newest first).
+    Parsing stops at the row matching the watermark, see until_watermark.
+    """
+    parser = _ActivityTableParser(url, watermark)
+    try:
+        parser.feed(html)
+        parser.close()
+    except _WatermarkReached:
+        pass
+
+    return parser.events
+
+
+def _lookup(data: Any, path: str):
+    for part in path.split("."):
+        if not isinstance(data, dict) or part not in data:
+            raise KeyError(path)
+
+        data = data[part]
+
+    return data
+
+
+def _find_activity_list(data: Any, fields: Dict[str, str]) -> Optional[List[dict]]:
+    """
+    Searches the page payload for the first list whose items have the event type and token id fields.
+    """
+    if isinstance(data, list):
+        if data and all(isinstance(item, dict) for item in data):
+            try:
+                for item in data:
+                    _lookup(item, fields["EVENT_TYPE"])
+                    _lookup(item, fields["TOKEN_ID"])
+            except KeyError:
+                pass
+            else:
+                return data
+
+        children = data
+    elif isinstance(data, dict):
+        children = data.values()
+    else:
+        return None
+
+    for child in children:
+        found = _find_activity_list(child, fields)
+        if found != None:
+            return found
+
+    return None
+
+
+def _text_field(item: dict, path: str):
+    """
+    A payload value as the activity table would show it, with the whitespace collapsed like the html parser does.
+    Missing and empty values are None.
+    """
+    try:
+        value = _lookup(item, path)
+    except KeyError:
+        return None
+
+    if value == None:
+        return None
+
+    text = _WHITESPACE.sub(" ", str(value)).strip()
+
+    return text if text else None
+
+
+def _address_field(item: dict, path: str):
+    """
+    The browser takes addresses from the end of the profile links, this also accepts such links in the payload.
+    """
+    text = _text_field(item, path)
+    if text == None:
+        return None
+
+    return text.rstrip("/").rsplit("/", 1)[-1]
+
+
+async def fetch_activity_http(
+    session: aiohttp.ClientSession,
+    url: str,
+    fields: Dict[str, str],
+    timeout: float,
+    watermark: Optional[EventFingerprint] = None,
+):
+    """
+    Reads the activity of a collection or wallet straight from the page payload Next.js ships with the HTML.
+    Returns events newest first, like the activity table, stopping at the watermark. Raises if the payload has no activity in it.
+
+    Values are brought into the form the browser scrape stores (no price unit, addresses instead of links, absolute image urls),
+    but the fields only give the same fingerprints as the browser if they hold the same text the activity table shows.
+    Check the configured fields against a real page payload before turning this on.
+    """
+    async with session.get(
+        url, timeout=aiohttp.ClientTimeout(total=timeout)
+    ) as response:
+        response.raise_for_status()
+        html = await response.text()
+
+    match = _NEXT_DATA.search(html)
+    if match == None:
+        raise Exception(f"No page payload found on {url}")
+
+    activity = _find_activity_list(orjson.loads(match.group(1)), fields)
+    if activity == None:
+        raise Exception(f"No activity found in the page payload of {url}")
+
+    events: List[ActivityEvent] = []
+    for item in activity:
+        preview_image_url = _text_field(item, fields["PREVIEW_IMAGE_URL"])
+        price = _text_field(item, fields["PRICE"])
+
+        event = ActivityEvent(
+            _text_field(item, fields["EVENT_TYPE"]) or "",
+            None if preview_image_url == None else urljoin(url, preview_image_url),
+            _text_field(item, fields["TOKEN_ID"]) or "",
+            None if price == None else _PRICE_UNIT.sub("", price),
+            _address_field(item, fields["TO_ADDRESS"]),
+            _address_field(item, fields["FROM_ADDRESS"]),
+            url,
+        )
+
+        if watermark != None and event_fingerprint(event) == watermark:
+            break
+
+        events.append(event)
+
+    return events
@@ -0,0 +1,331 @@
+import logging
+import os
+import queue
+import re
+import shutil
+import subprocess
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Iterator, List, Optional
+
+import undetected_chromedriver as uc
+from selenium.common.exceptions import SessionNotCreatedException
+
+from internal_tools.storage import atomic_write
+
+__all__ = ["BrowserPool", "browser_major_version", "prepare_chromedriver"]
+
+
+_VERSION = re.compile(r"(\d+)\.\d+")
+_BROWSER_VERSION_IN_ERROR = re.compile(r"Current browser version is (\d+)")
+
+
+def browser_major_version(browser_executable_path: str) -> Optional[int]:
+    """
+    Major version of the browser, from its --version output. None if it cant be found out (Windows builds print nothing).
+    """
+    try:
+        output = subprocess.run(
+            [browser_executable_path, "--version"],
+            capture_output=True,
+            text=True,
+            timeout=10,
+        ).stdout
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+    match = _VERSION.search(output)
+
+    return None if match == None else int(match.group(1))
+
+
+def prepare_chromedriver(
+    directory: str,
+    browser_executable_path: str = "brave-browser",
+    version_main: Optional[int] = None,
+    force: bool = False,
+):
+    """
+    Downloads and patches chromedriver once and keeps it in the directory, so browser launches can skip that step.
+    The major version it was made for is kept next to it and a new one is patched once the browser has another one,
+    version_main overrides the version read from the browser. Returns the path of the patched binary.
+    """
+    path = os.path.join(
+        directory, "chromedriver.exe" if sys.platform == "win32" else "chromedriver"
+    )
+    version_filename = os.path.join(directory, "version.txt")
+
+    if version_main == None:
+        version_main = browser_major_version(browser_executable_path)
+
+    if not force and os.path.exists(path):
+        try:
+            with open(version_filename, "r", encoding="utf-8") as f:
+                cached_version = int(f.read().strip())
+        except (OSError, ValueError):
+            cached_version = None
+
+        # Without a browser version there is nothing to compare, BrowserPool patches again if the session cant start.
+        if version_main == None or version_main == cached_version:
+            return path
+
+    os.makedirs(directory, exist_ok=True)
+
+    started = time.perf_counter()
+
+    patcher = uc.Patcher(version_main=version_main or 0)
+    patcher.auto()
+
+    # Swapped in at once, scrape workers might start browsers with the old one right now.
+    temp_path = path + f".{os.getpid()}.tmp"
+    shutil.copy(patcher.executable_path, temp_path)
+    os.replace(temp_path, path)
+    atomic_write(version_filename, str(patcher.version_main).encode())
+
+    logging.info(
+        f"Patched chromedriver {patcher.version_main} in {time.perf_counter() - started:.2f}s, "
+        "cached so browser launches skip this"
+    )
+
+    return path
+
+
+def _directory_size(path: str):
+    size = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                size += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+
+    return size
+
+
+class _PooledBrowser:
+    def __init__(self, driver: uc.Chrome, slot: int):
+        self.driver = driver
+        self.slot = slot
+        self.pages = 0
+
+
+class BrowserPool:
+    """
+    Keeps warm browsers around, so a scrape only costs a page navigation instead of a full browser start.
+    Browsers get recycled after a set amount of pages, or as soon as they stop responding.
+    """
+
+    def __init__(
+        self,
+        size: int,
+        max_pages_per_browser: int,
+        browser_executable_path: str = "brave-browser",
+        lean: bool = False,
+        blocked_url_patterns: List[str] = [],
+        driver_executable_path: Optional[str] = None,
+        profile_directory: Optional[str] = None,
+        max_profile_mb: float = 500,
+    ) -> None:
+        """
+        With lean set, browsers dont load images, media or fonts, run without GPU and extensions,
+        and block every request matching one of the blocked url patterns. Image src attributes are still in the DOM.
+
+        driver_executable_path should be a chromedriver patched by prepare_chromedriver, so launches dont patch again.
+        With a profile directory, every browser slot keeps its profile (and the HTTP cache for Alto's JS/CSS) between launches.
+        A profile that grew past max_profile_mb gets wiped before the next launch.
+        """
+        if size < 1:
+            raise ValueError("Pool size needs to be at least 1")
+
+        self.size = size
+        self.max_pages_per_browser = max_pages_per_browser
+        self.browser_executable_path = browser_executable_path
+        self.lean = lean
+        self.blocked_url_patterns = blocked_url_patterns
+        self.driver_executable_path = driver_executable_path
+        self.profile_directory = profile_directory
+        self.max_profile_size = max_profile_mb * 1024 * 1024
+
+        self._idle: "queue.Queue[_PooledBrowser]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._free_slots = list(range(size))
+        self._closed = False
+
+    def _options(self):
+        options = uc.ChromeOptions()
+        if not self.lean:
+            return options
+
+        for argument in [
+            "--disable-gpu",
+            "--disable-extensions",
+            "--blink-settings=imagesEnabled=false",
+            "--autoplay-policy=user-gesture-required",
+            "--mute-audio",
+        ]:
+            options.add_argument(argument)
+
+        options.add_experimental_option(
+            "prefs",
+            {
+                "profile.managed_default_content_settings.images": 2,
+                "profile.default_content_setting_values.media_stream": 2,
+            },
+        )
+
+        return options
+
+    def _profile(self, slot: int):
+        if self.profile_directory == None:
+            return None
+
+        path = os.path.join(self.profile_directory, str(slot))
+        if _directory_size(path) > self.max_profile_size:
+            shutil.rmtree(path, ignore_errors=True)
+
+        os.makedirs(path, exist_ok=True)
+
+        return os.path.abspath(path)
+
+    def _start_driver(self, slot: int):
+        options = self._options()
+        if self.profile_directory != None:
+            options.add_argument(f"--disk-cache-size={int(self.max_profile_size // 2)}")
+
+        return uc.Chrome(
+            options=options,
+            browser_executable_path=self.browser_executable_path,
+            driver_executable_path=self.driver_executable_path,
+            user_data_dir=self._profile(slot),
+            headless=True,
+        )
+
+    def _replace_driver(self, error: SessionNotCreatedException):
+        """
+        Patches a chromedriver for the version the browser reported, after it refused the cached one.
+        Falls back to patching on every launch if that fails.
+        """
+        match = _BROWSER_VERSION_IN_ERROR.search(str(error))
+        version_main = None if match == None else int(match.group(1))
+
+        try:
+            self.driver_executable_path = prepare_chromedriver(
+                os.path.dirname(self.driver_executable_path),  # type: ignore
+                self.browser_executable_path,
+                version_main,
+                force=version_main == None,
+            )
+        except Exception as e:
+            logging.warning(f"Couldnt replace the cached chromedriver: {e}")
+            self.driver_executable_path = None
+
+    def _launch(self, slot: int):
+        started = time.perf_counter()
+
+        try:
+            driver = self._start_driver(slot)
+        except SessionNotCreatedException as e:
+            if self.driver_executable_path == None:
+                raise
+
+            logging.warning(
+                f"Browser refused the cached chromedriver, patching a new one: {e.msg}"
+            )
+            self._replace_driver(e)
+            driver = self._start_driver(slot)
+
+        if self.lean and self.blocked_url_patterns:
+            try:
+                driver.execute_cdp_cmd("Network.enable", {})
+                driver.execute_cdp_cmd(
+                    "Network.setBlockedURLs", {"urls": self.blocked_url_patterns}
+                )
+            except:
+                driver.quit()
+                raise
+
+        logging.info(f"Browser started in {time.perf_counter() - started:.2f}s")
+
+        return _PooledBrowser(driver, slot)
+
+    def _quit(self, browser: _PooledBrowser):
+        try:
+            browser.driver.quit()
+        except:
+            pass
+
+        with self._lock:
+            self._free_slots.append(browser.slot)
+
+    def _is_healthy(self, browser: _PooledBrowser):
+        try:
+            browser.driver.current_url
+        except:
+            return False
+        else:
+            return True
+
+    def _acquire(self):
+        while True:
+            if self._closed:
+                raise RuntimeError("Browser pool is closed")
+
+            try:
+                browser = self._idle.get_nowait()
+            except queue.Empty:
+                with self._lock:
+                    slot = self._free_slots.pop() if self._free_slots else None
+
+                if slot != None:
+                    try:
+                        return self._launch(slot)
+                    except:
+                        with self._lock:
+                            self._free_slots.append(slot)
+                        raise
+
+                try:
+                    browser = self._idle.get(timeout=1)
+                except queue.Empty:
+                    continue
+
+            if self._is_healthy(browser):
+                return browser
+
+            self._quit(browser)
+
+    def _release(self, browser: _PooledBrowser):
+        browser.pages += 1
+
+        if (
+            self._closed
+            or browser.pages >= self.max_pages_per_browser
+            or not self._is_healthy(browser)
+        ):
+            self._quit(browser)
+        else:
+            self._idle.put(browser)
+
+    @contextmanager
+    def browser(self) -> Iterator[uc.Chrome]:
+        """
+        Borrow a browser from the pool, blocks until one is free.
+        """
+        browser = self._acquire()
+        try:
+            yield browser.driver
+        finally:
+            self._release(browser)
+
+    def close(self):
+        self._closed = True
+
+        while True:
+            try:
+                browser: Optional[_PooledBrowser] = self._idle.get_nowait()
+            except queue.Empty:
+                break
+
+            self._quit(browser)
@@ -0,0 +1,82 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import (
+    Awaitable,
+    Callable,
+    Dict,
+    Generic,
+    Hashable,
+    Optional,
+    Tuple,
+    TypeVar,
+)
+
+__all__ = ["ResultCache"]
+
+Key = TypeVar("Key", bound=Hashable)
+Value = TypeVar("Value")
+
+
+class ResultCache(Generic[Key, Value]):
+    """
+    Keeps results for a short time and lets concurrent callers for the same key share one run of the work.
+    Results of runs that raised are not kept.
+    """
+
+    def __init__(self, ttl: float, max_entries: int) -> None:
+        self.ttl = ttl
+        self.max_entries = max_entries
+
+        self._results: "OrderedDict[Key, Tuple[float, Value]]" = OrderedDict()
+        self._running: Dict[Key, "asyncio.Future[Value]"] = {}
+
+    def get(self, key: Key) -> Optional[Value]:
+        """
+        The cached result for the key, if there is one that didnt expire yet.
+        """
+        entry = self._results.get(key)
+        if entry == None:
+            return None
+
+        stored_at, value = entry
+        if time.monotonic() - stored_at > self.ttl:
+            del self._results[key]
+            return None
+
+        self._results.move_to_end(key)
+
+        return value
+
+    def put(self, key: Key, value: Value):
+        self._results[key] = (time.monotonic(), value)
+        self._results.move_to_end(key)
+
+        while len(self._results) > self.max_entries:
+            self._results.popitem(last=False)
+
+    async def get_or_run(self, key: Key, work: Callable[[], Awaitable[Value]]):
+        cached = self.get(key)
+        if cached != None:
+            return cached
+
+        if key in self._running:
+            return await asyncio.shield(self._running[key])
+
+        future: "asyncio.Future[Value]" = asyncio.get_running_loop().create_future()
+        self._running[key] = future
+        try:
+            value = await work()
+        except BaseException as e:
+            if isinstance(e, asyncio.CancelledError):
+                future.cancel()
+            else:
+                future.set_exception(e)
+                future.exception()  # Nobody might wait for it, dont warn about that
+            raise
+        else:
+            self.put(key, value)
+            future.set_result(value)
+            return value
+        finally:
+            del self._running[key]
@@ -1,13 +1,18 @@
+import asyncio
 import datetime
+import logging
 import os
 import re
+import threading
 import uuid
 from collections import UserDict
 from functools import reduce
-from typing import Any, Callable, Dict, List, Literal, Optional
+from typing import Any, Callable, Dict, List, Literal, Optional, Tuple
 
 import orjson
 
+from internal_tools.storage import atomic_write
+
 __all__ = ["CONFIG", "JsonDictSaver"]
 
 if not os.path.isdir("data"):
@@ -44,10 +49,19 @@ class Config(UserDict):
         for jds in self.values():
             jds.save()
 
+    async def save_async(self):
+        await asyncio.gather(*[jds.save_async() for jds in self.values()])
+
 
 class JsonDictSaver(UserDict):
     """
     Note: If you enter a dataclass, you manually have to convert it from type dict after loading.
+
+    A schema skips guessing the types of everything after loading. It has a type (or any converter) for the keys
+    of every level and one for the values at the end, {collection: {guild_id: webhook_url}} would be (str, int, str).
+
+    With write_behind_seconds > 0, save only marks the data as changed and it gets written at most once per interval
+    in an executor. Call flush before shutting down to write pending changes.
     """
 
     _supported_key_types = [
@@ -76,6 +90,13 @@ class JsonDictSaver(UserDict):
         object,
     ]
 
+    _datetime_pattern = re.compile(r"\d{1,4}-\d{1,2}-\d{1,4}T\d{1,2}:\d{1,2}:\d{1,2}")
+    _date_pattern = re.compile(r"\d{1,4}-\d{1,2}-\d{1,4}")
+    _time_pattern = re.compile(r"\d{1,2}:\d{1,2}:\d{1,2}")
+    _uuid_pattern = re.compile(
+        r"[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}"
+    )
+
     def __init__(
         self,
         name: str,
@@ -84,11 +105,18 @@ class JsonDictSaver(UserDict):
         data_type: Literal["data", "config", "config/default"] = "data",
         orjson_flags: List[int] = [orjson.OPT_INDENT_2],
         auto_convert_data: bool = True,
+        schema: Optional[Tuple[Callable[[Any], Any], ...]] = None,
+        write_behind_seconds: float = 0,
         **kwargs,
     ) -> None:
         super().__init__(**kwargs)
 
         self.filename = f"{data_type}/{name}.json"
+        self.write_behind_seconds = write_behind_seconds
+
+        self._dirty = False
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self._write_lock = threading.Lock()
 
         orjson_flags.extend(
             [
@@ -109,7 +137,9 @@ class JsonDictSaver(UserDict):
         with open(self.filename, "r", encoding="utf-8") as f:
             data = orjson.loads(f.read())
 
-        if auto_convert_data:
+        if schema != None:
+            self.data = self._decode_with_schema(data, schema)
+        elif auto_convert_data:
             self.data = self._convert_data_to_correct_types(data)
         else:
             self.data = data
@@ -130,8 +160,67 @@ class JsonDictSaver(UserDict):
         return super().__setitem__(key, item)
 
     def save(self):
-        with open(self.filename, "w", encoding="utf-8") as f:
-            f.write(orjson.dumps(self.data, option=self.orjson_option).decode())
+        if self.write_behind_seconds <= 0:
+            self._write()
+            return
+
+        self._dirty = True
+        if self._flush_handle != None:
+            return
+
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self.flush()  # Nothing to schedule the write on
+            return
+
+        self._flush_handle = loop.call_later(
+            self.write_behind_seconds, self._flush_in_executor, loop
+        )
+
+    async def save_async(self):
+        """
+        Like save, but serializes and writes in an executor instead of blocking the event loop.
+        Doesnt wait for the write behind interval.
+        """
+        if self._flush_handle != None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+
+        self._dirty = False
+        await asyncio.get_running_loop().run_in_executor(None, self._write)
+
+    def flush(self):
+        """
+        Writes pending changes right away.
+        """
+        if self._flush_handle != None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+
+        if self._dirty:
+            self._dirty = False
+            self._write()
+
+    def _flush_in_executor(self, loop: asyncio.AbstractEventLoop):
+        self._flush_handle = None
+        if not self._dirty:
+            return
+
+        self._dirty = False
+        loop.run_in_executor(None, self._write).add_done_callback(self._flushed)
+
+    def _flushed(self, future: asyncio.Future):
+        if future.exception() != None:
+            logging.error(f"Couldnt write {self.filename}: {future.exception()}")
+            self.save()  # Try again next interval
+
+    def _write(self):
+        # orjson holds the GIL while dumping, so the data cant change halfway through even from another thread.
+        with self._write_lock:
+            atomic_write(
+                self.filename, orjson.dumps(self.data, option=self.orjson_option)
+            )
 
     def _convert_single_value_to_correct_type(self, val):
         if isinstance(val, str):
@@ -150,23 +239,33 @@ class JsonDictSaver(UserDict):
             elif val == "null":
                 val = None
 
-            elif re.match(r"\d{1,4}-\d{1,2}-\d{1,4}T\d{1,2}:\d{1,2}:\d{1,2}", val):
+            elif self._datetime_pattern.match(val):
                 val = datetime.datetime.fromisoformat(val)
 
-            elif re.match(r"\d{1,4}-\d{1,2}-\d{1,4}", val):
+            elif self._date_pattern.match(val):
                 val = datetime.date.fromisoformat(val)
 
-            elif re.match(r"\d{1,2}:\d{1,2}:\d{1,2}", val):
+            elif self._time_pattern.match(val):
                 val = datetime.time.fromisoformat(val)
 
-            elif re.match(
-                r"[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}",
-                val,
-            ):
+            elif self._uuid_pattern.match(val):
                 val = uuid.UUID("{" f"{val}" "}")
 
         return val
 
+    def _decode_with_schema(
+        self, data: dict, schema: Tuple[Callable[[Any], Any], ...]
+    ) -> dict:
+        key_type = schema[0]
+        if len(schema) == 2:
+            value_type = schema[1]
+            return {key_type(k): value_type(v) for k, v in data.items()}
+
+        return {
+            key_type(k): self._decode_with_schema(v, schema[1:])
+            for k, v in data.items()
+        }
+
     def _convert_data_to_correct_types(self, data: dict):
         new_data = {}
 
@@ -0,0 +1,192 @@
+import asyncio
+import logging
+import time
+from typing import Any, Callable, Dict, Mapping, Optional, Tuple
+
+import aiohttp
+import orjson
+
+__all__ = ["WebhookDelivery", "WebhookRejected", "webhook_id"]
+
+Job = Tuple[Dict[str, Any], "asyncio.Future[None]"]
+
+
+def webhook_id(webhook_url: str):
+    """
+    The part of a webhook url that is fine to log, the rest is its token.
+    """
+    parts = webhook_url.rstrip("/").split("/")
+
+    return parts[-2] if len(parts) >= 2 else "?"
+
+
+class WebhookRejected(Exception):
+    """
+    Discord refused the message itself (unknown webhook, invalid body, ...), sending it again wont help.
+    """
+
+
+class _RateLimitBucket:
+    """
+    What Discord said about the rate limit of one webhook in its last answer.
+    """
+
+    __slots__ = ("remaining", "reset_at")
+
+    def __init__(self) -> None:
+        self.remaining: Optional[int] = None
+        self.reset_at = 0.0
+
+    def update(self, headers: Mapping[str, str]):
+        remaining = headers.get("X-RateLimit-Remaining")
+        reset_after = headers.get("X-RateLimit-Reset-After")
+
+        if remaining != None:
+            self.remaining = int(remaining)
+        if reset_after != None:
+            self.reset_at = time.monotonic() + float(reset_after)
+
+    def wait_time(self):
+        if self.remaining != 0:
+            return 0.0
+
+        return max(0.0, self.reset_at - time.monotonic())
+
+
+class WebhookDelivery:
+    """
+    Posts webhook messages with one queue and worker per webhook url, so a slow or rate limited webhook only delays itself.
+    Workers follow the rate limit headers of their webhook, retry 429s, server and connection errors (up to max_attempts)
+    and stop after idle_seconds without messages. At most max_concurrent requests run at the same time.
+    """
+
+    def __init__(
+        self,
+        get_session: Callable[[], aiohttp.ClientSession],
+        max_concurrent: int,
+        max_attempts: int,
+        idle_seconds: float = 60,
+    ) -> None:
+        self.get_session = get_session
+        self.max_attempts = max_attempts
+        self.idle_seconds = idle_seconds
+
+        self._limit = asyncio.Semaphore(max_concurrent)
+        self._queues: Dict[str, "asyncio.Queue[Job]"] = {}
+        self._workers: Dict[str, asyncio.Task] = {}
+        self._global_reset_at = 0.0
+
+    def send(self, webhook_url: str, payload: Dict[str, Any]):
+        """
+        Queues a message (the json body of a webhook execute request) and returns a future for its delivery.
+        """
+        loop = asyncio.get_running_loop()
+
+        future: "asyncio.Future[None]" = loop.create_future()
+        queue = self._queues.setdefault(webhook_url, asyncio.Queue())
+        queue.put_nowait((payload, future))
+
+        if webhook_url not in self._workers:
+            self._workers[webhook_url] = loop.create_task(
+                self._work(webhook_url, queue)
+            )
+
+        return future
+
+    async def _work(self, webhook_url: str, queue: "asyncio.Queue[Job]"):
+        bucket = _RateLimitBucket()
+        try:
+            while True:
+                try:
+                    payload, future = await asyncio.wait_for(
+                        queue.get(), self.idle_seconds
+                    )
+                except asyncio.TimeoutError:
+                    break
+
+                if future.done():
+                    continue  # Whoever sent it gave up on it
+
+                try:
+                    await self._deliver(webhook_url, payload, bucket)
+                except asyncio.CancelledError:
+                    future.cancel()
+                    raise
+                except Exception as e:
+                    logging.error(
+                        f"Couldnt deliver a message to webhook {webhook_id(webhook_url)}: {e}"
+                    )
+                    if not future.done():
+                        future.set_exception(e)
+                        future.exception()  # Nobody might wait for it, dont warn about that
+                else:
+                    if not future.done():
+                        future.set_result(None)
+        finally:
+            del self._workers[webhook_url]
+            del self._queues[webhook_url]
+
+            # Only left over if the worker got cancelled, they wont be sent anymore.
+            while not queue.empty():
+                queue.get_nowait()[1].cancel()
+
+    async def _deliver(
+        self, webhook_url: str, payload: Dict[str, Any], bucket: _RateLimitBucket
+    ):
+        for attempt in range(self.max_attempts):
+            wait_time = max(
+                bucket.wait_time(), self._global_reset_at - time.monotonic()
+            )
+            if wait_time > 0:
+                await asyncio.sleep(wait_time)
+
+            try:
+                async with self._limit:
+                    async with self.get_session().post(
+                        webhook_url,
+                        data=orjson.dumps(payload),
+                        headers={"Content-Type": "application/json"},
+                    ) as response:
+                        bucket.update(response.headers)
+                        status = response.status
+                        body = await response.read()
+            except aiohttp.ClientError as e:
+                logging.warning(
+                    f"Webhook {webhook_id(webhook_url)} failed with {e}, attempt {attempt + 1}/{self.max_attempts}"
+                )
+                await asyncio.sleep(min(2**attempt, 30))
+                continue
+
+            if status < 300:
+                return
+
+            if status == 429:
+                try:
+                    data = orjson.loads(body)
+                except orjson.JSONDecodeError:
+                    data = {}
+
+                retry_after = float(
+                    data.get("retry_after", response.headers.get("Retry-After", 1))
+                )
+                if data.get("global") or response.headers.get("X-RateLimit-Global"):
+                    self._global_reset_at = time.monotonic() + retry_after
+                else:
+                    bucket.remaining = 0
+                    bucket.reset_at = time.monotonic() + retry_after
+
+                continue
+
+            if status >= 500:
+                await asyncio.sleep(min(2**attempt, 30))
+                continue
+
+            raise WebhookRejected(
+                f"Webhook answered with {status}: {body[:200].decode(errors='replace')}"
+            )
+
+        raise Exception(f"Gave up after {self.max_attempts} attempts")
+
+    def close(self):
+        for worker in list(self._workers.values()):
+            worker.cancel()
@@ -1,12 +1,24 @@
 import datetime
-from typing import List, Optional, Union
+import traceback
+from typing import Callable, Iterator, List, Optional, TypeVar, Union
 
 import aiohttp
 import nextcord
 
 from internal_tools.configuration import CONFIG
 
-__all__ = ["log_error_in_discord", "fancy_embed", "GetOrFetch", "CatalogView"]
+__all__ = [
+    "log_error_in_discord",
+    "fancy_embed",
+    "embed_batches",
+    "GetOrFetch",
+    "CatalogView",
+]
+
+EmbedLike = TypeVar("EmbedLike")
+
+MAX_EMBEDS_PER_MESSAGE = 10
+MAX_EMBED_CHARACTERS_PER_MESSAGE = 6000
 
 
 def CONFIG_EMBED_COLOR():
@@ -16,15 +28,26 @@ def CONFIG_EMBED_COLOR():
     return nextcord.Colour(int(CONFIG["GENERAL"]["EMBED_COLOR"].replace("#", ""), 16))
 
 
-async def log_error_in_discord(exception: Exception):
-    if CONFIG["GENERAL"]["ERROR_WEBHOOK_URL"]:
-        async with aiohttp.ClientSession() as session:
-            webhook = nextcord.Webhook.from_url(
-                CONFIG["GENERAL"]["ERROR_WEBHOOK_URL"], session=session
-            )
+async def log_error_in_discord(
+    exception: Exception, session: Optional[aiohttp.ClientSession] = None
+):
+    """
+    Sends the traceback to the error webhook. Uses the given session, or a new one if there is none.
+    """
+    if not CONFIG["GENERAL"]["ERROR_WEBHOOK_URL"]:
+        return
 
-            text = "".join(traceback.format_exception(type(exception), exception, exception.__traceback__))  # type: ignore
-            await webhook.send(f"Unpredicted Error:\n```\n{text}\n```")
+    if session == None:
+        async with aiohttp.ClientSession() as new_session:
+            await log_error_in_discord(exception, new_session)
+        return
+
+    webhook = nextcord.Webhook.from_url(
+        CONFIG["GENERAL"]["ERROR_WEBHOOK_URL"], session=session
+    )
+
+    text = "".join(traceback.format_exception(type(exception), exception, exception.__traceback__))  # type: ignore
+    await webhook.send(f"Unpredicted Error:\n```\n{text}\n```")
 
 
 class CatalogView(nextcord.ui.View):
@@ -205,6 +228,31 @@ def fancy_embed(
     return embed
 
 
+def embed_batches(
+    embeds: List[EmbedLike], length: Callable[[EmbedLike], int] = len
+) -> Iterator[List[EmbedLike]]:
+    """
+    Splits embeds into groups that fit into one message (10 embeds, 6000 characters), keeping their order.
+    Anything else that stands for an embed works too, as long as length gives its character count.
+    """
+    batch: List[EmbedLike] = []
+    characters = 0
+    for embed in embeds:
+        if batch and (
+            len(batch) == MAX_EMBEDS_PER_MESSAGE
+            or characters + length(embed) > MAX_EMBED_CHARACTERS_PER_MESSAGE
+        ):
+            yield batch
+            batch = []
+            characters = 0
+
+        batch.append(embed)
+        characters += length(embed)
+
+    if batch:
+        yield batch
+
+
 class GetOrFetch:
     """
     Collection of functions that 'Get or Fetch' things and hide errors, so i dont have to try except all the time.
@@ -0,0 +1,130 @@
+import sys
+from typing import Any, List, Optional
+from urllib.parse import urljoin
+
+__all__ = ["ActivityEvent"]
+
+
+def _intern(text: Optional[str]):
+    return None if text == None else sys.intern(text)
+
+
+class ActivityEvent:
+    """
+    One row of an activity table (a sale, listing, transfer, ...).
+    Event types, prices, addresses and page urls repeat a lot between events and are interned.
+    The urls of the token and the addresses are built from the page url when needed instead of being stored.
+    """
+
+    __slots__ = (
+        "event_type",
+        "preview_image_url",
+        "token_id",
+        "price",
+        "to_address",
+        "from_address",
+        "page_url",
+        "seen_at",
+    )
+
+    def __init__(
+        self,
+        event_type: str,
+        preview_image_url: Optional[str],
+        token_id: str,
+        price: Optional[str],
+        to_address: Optional[str],
+        from_address: Optional[str],
+        page_url: str,
+        seen_at: Optional[int] = None,
+    ) -> None:
+        self.event_type: str = sys.intern(event_type)
+        self.preview_image_url = preview_image_url
+        self.token_id = token_id
+        self.price = _intern(price)
+        self.to_address = _intern(to_address)
+        self.from_address = _intern(from_address)
+        self.page_url: str = sys.intern(page_url)
+        self.seen_at = seen_at
+
+    def __reduce__(self):
+        # Goes through __init__ again, so events coming back from the scrape workers get interned too.
+        return (ActivityEvent, tuple(getattr(self, name) for name in self.__slots__))
+
+    def __repr__(self) -> str:
+        return f"ActivityEvent({self.event_type!r}, token_id={self.token_id!r}, price={self.price!r})"
+
+    @property
+    def token_url(self):
+        return self.page_url + "/" + self.token_id
+
+    def _address_url(self, address: Optional[str]):
+        if address == None:
+            return None
+
+        return urljoin(self.page_url, "/profile/" + address)
+
+    @property
+    def to_address_url(self):
+        return self._address_url(self.to_address)
+
+    @property
+    def from_address_url(self):
+        return self._address_url(self.from_address)
+
+    def with_seen_at(self, seen_at: int):
+        """
+        Copy of the event with seen_at set, scraped events are shared between everyone waiting for the same page.
+        """
+        return ActivityEvent(*self.to_record()[:-1], seen_at=seen_at)
+
+    def to_record(self) -> List[Any]:
+        """
+        The stored form of the event, a plain list without any of the derived urls.
+        """
+        return [
+            self.event_type,
+            self.preview_image_url,
+            self.token_id,
+            self.price,
+            self.to_address,
+            self.from_address,
+            self.page_url,
+            self.seen_at,
+        ]
+
+    @classmethod
+    def from_record(cls, record: Any):
+        """
+        Reads the stored form of an event. Also takes the event dicts that were stored before this existed.
+        """
+        if isinstance(record, list):
+            return cls(*record)
+
+        seen_at = record.get("SEEN_AT")
+
+        return cls(
+            str(record["EVENT_TYPE"]),
+            record["PREVIEW_IMAGE_URL"],
+            str(record["TOKEN_ID"]),
+            record["PRICE"],
+            record["TO_ADDRESS"],
+            record["FROM_ADDRESS"],
+            record["TOKEN_URL"].rsplit("/", 1)[0],
+            None if seen_at == None else int(seen_at),
+        )
+
+    @classmethod
+    def from_legacy_records(cls, records: List[Any]):
+        """
+        Reads the event list of a target from the plain json files used before the event log.
+        add-wallet stored its (events, error) tuple there, so lists get unwrapped and everything but event dicts skipped.
+        """
+        events: List[ActivityEvent] = []
+        for record in records:
+            if isinstance(record, list):
+                events.extend(cls.from_legacy_records(record))
+            elif isinstance(record, dict):
+                events.append(cls.from_record(record))
+
+        return events
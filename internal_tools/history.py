@@ -0,0 +1,219 @@
+import asyncio
+import hashlib
+import time
+from collections import OrderedDict
+from typing import Iterable, List, Optional, Set, Union
+
+import orjson
+
+from internal_tools.alto import EventFingerprint, event_fingerprint, fingerprint_index
+from internal_tools.events import ActivityEvent
+from internal_tools.storage import SqliteDatabase, SqliteEventLog, ShardedEventLog
+
+__all__ = ["EventIndex", "EventHistory", "fingerprint_digest"]
+
+
+def fingerprint_digest(fingerprint: EventFingerprint):
+    """
+    Short stand-in for a fingerprint, used to remember events that were dropped from the history.
+    """
+    return hashlib.blake2b(orjson.dumps(fingerprint), digest_size=8).hexdigest()
+
+
+class EventIndex:
+    """
+    Answers if an event is known in O(1).
+    Holds the fingerprints of the stored events and the digests of the events retention dropped.
+    """
+
+    def __init__(
+        self, events: Iterable[ActivityEvent], dropped_digests: Iterable[str]
+    ) -> None:
+        self._fingerprints = fingerprint_index(events)
+        self._dropped: Set[str] = set(dropped_digests)
+
+    def __contains__(self, fingerprint: EventFingerprint):
+        if fingerprint in self._fingerprints:
+            return True
+
+        return bool(self._dropped) and fingerprint_digest(fingerprint) in self._dropped
+
+    def add(self, fingerprint: EventFingerprint):
+        self._fingerprints.add(fingerprint)
+
+    def drop(self, fingerprint: EventFingerprint):
+        digest = fingerprint_digest(fingerprint)
+
+        self._fingerprints.discard(fingerprint)
+        self._dropped.add(digest)
+
+        return digest
+
+    def forget_digests(self, digests: Iterable[str]):
+        self._dropped.difference_update(digests)
+
+
+class EventHistory:
+    """
+    Known events of every target of one kind (collections or wallets).
+    Keeps at most max_events per target and none older than max_age_days (0 turns a limit off).
+    Dropped events are remembered as digests (up to max_digests per target), so they never get reported again.
+    Stored in one event log per target under data/, or in the database if one is given.
+    Only the events and indexes of the max_loaded_targets most recently used targets are kept in memory.
+    """
+
+    def __init__(
+        self,
+        kind: str,
+        max_events: int,
+        max_age_days: float,
+        max_digests: int,
+        compact_after_records: int,
+        max_loaded_targets: int,
+        database: Optional[SqliteDatabase] = None,
+    ) -> None:
+        self.max_events = max_events
+        self.max_age = max_age_days * 24 * 60 * 60
+        self.max_digests = max_digests
+        self.max_loaded_targets = max_loaded_targets
+
+        self.events: Union[ShardedEventLog, SqliteEventLog]
+        self.dropped: Union[ShardedEventLog, SqliteEventLog]
+        if database == None:
+            self.events = ShardedEventLog(
+                f"{kind}_events",
+                compact_after_records,
+                ActivityEvent.to_record,
+                ActivityEvent.from_record,
+                max_loaded_targets,
+                ActivityEvent.from_legacy_records,
+            )
+            self.dropped = ShardedEventLog(
+                f"{kind}_event_digests",
+                compact_after_records,
+                max_loaded_targets=max_loaded_targets,
+            )
+        else:
+            self.events = SqliteEventLog(database, kind, "events", max_loaded_targets)
+            self.dropped = SqliteEventLog(database, kind, "digests", max_loaded_targets)
+
+        self._indexes: "OrderedDict[str, EventIndex]" = OrderedDict()
+
+    def known(self, target: str):
+        """
+        Index of the known events of a target, built on first use and kept up to date afterwards.
+        """
+        if target in self._indexes:
+            self._indexes.move_to_end(target)
+            return self._indexes[target]
+
+        index = EventIndex(self.events.get(target, []), self.dropped.get(target, []))
+        self._indexes[target] = index
+
+        while len(self._indexes) > self.max_loaded_targets:
+            self._indexes.popitem(last=False)
+
+        return index
+
+    def watermark(self, target: str):
+        """
+        Fingerprint of the newest known event of a target.
+        """
+        known_events = self.events.get(target)
+        if not known_events:
+            return None
+
+        return event_fingerprint(known_events[-1])
+
+    def _apply_retention(self, target: str):
+        known_events: List[ActivityEvent] = self.events.get(target, [])
+        now = time.time()
+
+        keep_from = 0
+        if self.max_events > 0:
+            keep_from = max(keep_from, len(known_events) - self.max_events)
+
+        if self.max_age > 0:
+            while (
+                keep_from < len(known_events)
+                and now - (known_events[keep_from].seen_at or now) > self.max_age
+            ):
+                keep_from += 1
+
+        if keep_from == 0:
+            return
+
+        index = self.known(target)
+        self.dropped.append(
+            target,
+            [
+                index.drop(event_fingerprint(event))
+                for event in known_events[:keep_from]
+            ],
+        )
+        self.events.trim(target, keep_from)
+
+        digests: List[str] = self.dropped.get(target, [])
+        if self.max_digests > 0 and len(digests) > self.max_digests:
+            index.forget_digests(digests[: -self.max_digests])
+            self.dropped.trim(target, len(digests) - self.max_digests)
+
+    def remember(self, target: str, new_events: List[ActivityEvent]):
+        index = self.known(target)
+
+        seen_at = int(time.time())
+        self.events.append(
+            target, [event.with_seen_at(seen_at) for event in new_events]
+        )
+        for event in new_events:
+            index.add(event_fingerprint(event))
+
+        self._apply_retention(target)
+
+    def reset(self, target: str, initial_events: List[ActivityEvent]):
+        """
+        Replaces the known events of a target. Digests of dropped events stay.
+        """
+        seen_at = int(time.time())
+        self.events.set(
+            target, [event.with_seen_at(seen_at) for event in initial_events]
+        )
+        self._indexes.pop(target, None)
+
+        self._apply_retention(target)
+
+    async def compact(self):
+        """
+        Applies the age limit to every target and writes fresh snapshots of the targets with changes in their logs.
+        Goes through the targets one at a time and lets the event loop run in between.
+        Events from before retention existed count as seen now.
+        """
+        if self.max_age > 0:
+            # The event count limit is applied whenever events get stored, only the age limit needs to read every target.
+            seen_at = int(time.time())
+            for target, known_events in self.events.items():
+                stamped = False
+                for event in known_events:
+                    if event.seen_at == None:
+                        event.seen_at = seen_at
+                        stamped = True
+
+                if stamped:
+                    # Written through the log, only changing them in memory wouldnt last past a restart.
+                    self.events.set(target, known_events)
+
+                self._apply_retention(target)
+                await asyncio.sleep(0)
+
+        for log in (self.events, self.dropped):
+            if isinstance(log, SqliteEventLog):
+                log.compact()
+                continue
+
+            for target in log.targets_to_compact():
+                log.compact_target(target)
+                await asyncio.sleep(0)
+
+    def close(self):
+        self.events.close()
+        self.dropped.close()
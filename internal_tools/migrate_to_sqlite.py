@@ -0,0 +1,60 @@
+"""
+Copies the listeners and event histories from the json files in data/ into the sqlite database.
+
+Run from the bot directory with: python -m internal_tools.migrate_to_sqlite
+Then set ALTO_TRACKER.STORAGE.ENGINE to "sqlite" in config/ALTO_TRACKER.json.
+"""
+
+from typing import List, Literal, Tuple
+
+from internal_tools.configuration import CONFIG, JsonDictSaver
+from internal_tools.events import ActivityEvent
+from internal_tools.storage import (
+    ShardedEventLog,
+    SqliteDatabase,
+    SqliteEventLog,
+    SqliteListenerSaver,
+)
+
+
+def migrate():
+    database = SqliteDatabase(CONFIG["ALTO_TRACKER"]["STORAGE"]["SQLITE_PATH"])
+
+    for store in ["collection_event_log_listeners", "wallet_event_log_listeners"]:
+        listeners = SqliteListenerSaver(database, store)
+        for target, guild_webhooks in JsonDictSaver(store).items():
+            listeners[str(target)] = dict(guild_webhooks)
+
+        listeners.save()
+        print(f"{store}: {len(listeners)} targets")
+
+    for kind in ["collection", "wallet"]:
+        tables: List[Tuple[str, Literal["events", "digests"]]] = [
+            (f"{kind}_events", "events"),
+            (f"{kind}_event_digests", "digests"),
+        ]
+        for name, table in tables:
+            if table == "events":
+                source = ShardedEventLog(
+                    name,
+                    encode=ActivityEvent.to_record,
+                    decode=ActivityEvent.from_record,
+                    decode_legacy=ActivityEvent.from_legacy_records,
+                )
+            else:
+                source = ShardedEventLog(name)
+            destination = SqliteEventLog(database, kind, table)
+
+            entries = 0
+            for target, items in source.items():
+                destination.set(target, items)
+                entries += len(items)
+
+            print(f"{name}: {entries} entries")
+            source.close()
+
+    database.close()
+
+
+if __name__ == "__main__":
+    migrate()
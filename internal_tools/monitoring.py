@@ -0,0 +1,63 @@
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+from typing import Optional
+
+__all__ = ["LoopLagMonitor"]
+
+
+class LoopLagMonitor:
+    """
+    Logs when something blocks the event loop for longer than threshold seconds, with the stack of what is blocking it.
+    A task on the loop keeps a heartbeat and a watchdog thread checks that it keeps beating.
+    """
+
+    def __init__(self, threshold: float, check_interval: float = 0.1) -> None:
+        self.threshold = threshold
+        self.check_interval = check_interval
+
+        self._last_beat = time.monotonic()
+        self._loop_thread_id: Optional[int] = None
+        self._heartbeat: Optional[asyncio.Task] = None
+        self._stopped = threading.Event()
+
+    def start(self):
+        """
+        Needs to be called from inside the loop that should be watched.
+        """
+        self._loop_thread_id = threading.get_ident()
+        self._last_beat = time.monotonic()
+        self._heartbeat = asyncio.get_running_loop().create_task(self._beat())
+
+        threading.Thread(
+            target=self._watch, name="loop-lag-monitor", daemon=True
+        ).start()
+
+    def stop(self):
+        self._stopped.set()
+        if self._heartbeat != None:
+            self._heartbeat.cancel()
+
+    async def _beat(self):
+        while True:
+            self._last_beat = time.monotonic()
+            await asyncio.sleep(self.check_interval)
+
+    def _watch(self):
+        reported_beat = None
+        while not self._stopped.wait(self.check_interval):
+            last_beat = self._last_beat
+            lag = time.monotonic() - last_beat
+            if lag <= self.threshold or last_beat == reported_beat:
+                continue
+
+            reported_beat = last_beat  # Report every stall once
+
+            frame = sys._current_frames().get(self._loop_thread_id)  # type: ignore
+            stack = "".join(traceback.format_stack(frame)) if frame else ""
+            logging.warning(
+                f"Event loop blocked for more than {lag:.2f}s, currently running:\n{stack}"
+            )
@@ -0,0 +1,117 @@
+import asyncio
+import logging
+from typing import Any, Callable, Dict, List, Set, Tuple
+
+from internal_tools.delivery import WebhookDelivery, WebhookRejected, webhook_id
+from internal_tools.discord import embed_batches
+from internal_tools.storage import EventLog
+
+__all__ = ["Outbox"]
+
+
+class Outbox:
+    """
+    Embeds waiting to be sent to webhooks, kept in an EventLog (one list per webhook url) until Discord accepted them,
+    so neither a failed delivery nor a restart loses a notification.
+
+    One drain task per webhook sends the waiting embeds in order, as many per message as fit, through the WebhookDelivery.
+    Failed messages are retried with backoff up to max_backoff seconds apart, messages Discord rejects are dropped.
+    Embeds are identified by a digest the caller gives them, one that is already waiting for a webhook isnt queued again.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        delivery: WebhookDelivery,
+        message_defaults: Callable[[], Dict[str, Any]],
+        max_backoff: float,
+        compact_after_records: int,
+    ) -> None:
+        self.delivery = delivery
+        self.message_defaults = message_defaults
+        self.max_backoff = max_backoff
+
+        self.log = EventLog(name, compact_after_records)
+
+        self._waiting: Dict[str, Set[str]] = {
+            webhook_url: {entry["DIGEST"] for entry in entries}
+            for webhook_url, entries in self.log.items()
+        }
+        self._drains: Dict[str, asyncio.Task] = {}
+
+    def put(self, webhook_url: str, embeds: List[Tuple[str, Dict[str, Any], int]]):
+        """
+        Queues (digest, embed dict, character count) entries for a webhook, in the order they should arrive.
+        """
+        waiting = self._waiting.setdefault(webhook_url, set())
+
+        entries = []
+        for digest, embed, length in embeds:
+            if digest in waiting:
+                continue
+
+            waiting.add(digest)
+            entries.append({"DIGEST": digest, "EMBED": embed, "LENGTH": length})
+
+        self.log.append(webhook_url, entries)
+
+        self._start_drain(webhook_url)
+
+    def resume(self):
+        """
+        Starts draining every webhook with waiting embeds that isnt drained right now, like after a restart.
+        """
+        for webhook_url, entries in list(self.log.items()):
+            if entries:
+                self._start_drain(webhook_url)
+
+    def _start_drain(self, webhook_url: str):
+        if webhook_url not in self._drains and self.log.get(webhook_url):
+            self._drains[webhook_url] = asyncio.get_running_loop().create_task(
+                self._drain(webhook_url)
+            )
+
+    async def _drain(self, webhook_url: str):
+        failures = 0
+        try:
+            while True:
+                entries = self.log.get(webhook_url)
+                if not entries:
+                    self.log.delete(webhook_url)
+                    self._waiting.pop(webhook_url, None)
+                    break
+
+                batch = next(embed_batches(entries, length=lambda e: e["LENGTH"]))
+                try:
+                    await self.delivery.send(
+                        webhook_url,
+                        dict(
+                            self.message_defaults(),
+                            embeds=[entry["EMBED"] for entry in batch],
+                        ),
+                    )
+                except WebhookRejected as e:
+                    logging.error(
+                        f"Dropping {len(batch)} embeds for webhook {webhook_id(webhook_url)}: {e}"
+                    )
+                except Exception:
+                    failures += 1
+                    await asyncio.sleep(min(2**failures, self.max_backoff))
+                    continue
+
+                failures = 0
+                self.log.trim(webhook_url, len(batch))
+                self._waiting[webhook_url].difference_update(
+                    entry["DIGEST"] for entry in batch
+                )
+        finally:
+            del self._drains[webhook_url]
+
+    def compact(self):
+        self.log.compact()
+
+    def close(self):
+        for drain in list(self._drains.values()):
+            drain.cancel()
+
+        self.log.close()
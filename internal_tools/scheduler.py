@@ -0,0 +1,118 @@
+import heapq
+import random
+import time
+from typing import Dict, Generic, Hashable, Iterable, List, Set, Tuple, TypeVar
+
+__all__ = ["PollScheduler"]
+
+Key = TypeVar("Key", bound=Hashable)
+
+
+class PollScheduler(Generic[Key]):
+    """
+    Decides when each target gets polled next.
+    Targets that had new events get polled at the minimum interval, idle ones back off up to the maximum interval.
+    A token bucket caps how many polls can start per minute over all targets.
+    """
+
+    def __init__(
+        self,
+        initial_interval: float,
+        min_interval: float,
+        max_interval: float,
+        backoff_factor: float,
+        jitter: float,
+        polls_per_minute: float,
+    ) -> None:
+        self.initial_interval = initial_interval
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff_factor = backoff_factor
+        self.jitter = jitter
+        self.polls_per_minute = polls_per_minute
+
+        self._queue: List[Tuple[float, int, Key]] = []
+        self._due: Dict[Key, float] = {}
+        self._intervals: Dict[Key, float] = {}
+        self._running: Set[Key] = set()
+        self._counter = 0
+
+        self._tokens = polls_per_minute
+        self._last_refill = time.monotonic()
+
+    def _push(self, key: Key, due: float):
+        self._counter += 1
+        self._due[key] = due
+        heapq.heappush(self._queue, (due, self._counter, key))
+
+    def _refill(self, now: float):
+        self._tokens = min(
+            self.polls_per_minute,
+            self._tokens + (now - self._last_refill) * self.polls_per_minute / 60,
+        )
+        self._last_refill = now
+
+    def sync(self, keys: Iterable[Key]):
+        """
+        Starts scheduling new targets (spread over the jitter window) and forgets removed ones.
+        """
+        now = time.monotonic()
+        keys = set(keys)
+
+        for key in keys:
+            if key not in self._due and key not in self._running:
+                self._intervals.setdefault(key, self.initial_interval)
+                self._push(key, now + random.uniform(0, self.jitter))
+
+        for key in list(self._intervals):
+            if key not in keys:
+                self._due.pop(key, None)
+                del self._intervals[key]
+
+    def pop_due(self):
+        """
+        Takes the targets that are due now, as far as the poll budget allows.
+        They stay out of the queue until report is called for them.
+        """
+        now = time.monotonic()
+        self._refill(now)
+
+        due_keys: List[Key] = []
+        while self._queue and self._queue[0][0] <= now and self._tokens >= 1:
+            due, _, key = heapq.heappop(self._queue)
+
+            if self._due.get(key) != due:
+                continue  # Removed or rescheduled since this entry was queued
+
+            del self._due[key]
+            self._running.add(key)
+            self._tokens -= 1
+            due_keys.append(key)
+
+        return due_keys
+
+    def report(self, key: Key, had_new_events: bool):
+        """
+        Puts a polled target back into the queue with an interval based on what the poll found.
+        """
+        self._running.discard(key)
+
+        if key not in self._intervals:
+            return  # Target was removed while it was polled
+
+        if had_new_events:
+            interval = self.min_interval
+        else:
+            interval = min(
+                self.max_interval, self._intervals[key] * self.backoff_factor
+            )
+
+        self._intervals[key] = interval
+        self._push(
+            key,
+            time.monotonic()
+            + max(
+                self.min_interval,
+                interval + random.uniform(-self.jitter, self.jitter),
+            ),
+        )
@@ -0,0 +1,108 @@
+import time
+from typing import Dict, List, Optional
+
+import undetected_chromedriver as uc
+from selenium.common.exceptions import TimeoutException
+from selenium.webdriver.common.by import By
+from selenium.webdriver.remote.webelement import WebElement
+from selenium.webdriver.support import expected_conditions
+from selenium.webdriver.support.ui import WebDriverWait
+
+from internal_tools.alto import (
+    ActivityCell,
+    EventFingerprint,
+    event_from_cells,
+    parse_activity_table_html,
+    until_watermark,
+)
+from internal_tools.events import ActivityEvent
+
+__all__ = ["scrape_activity"]
+
+
+def _activity_table_populated(table_selector: str):
+    def check(driver: uc.Chrome):
+        tables = driver.find_elements(By.XPATH, table_selector)
+        if not tables:
+            return False
+
+        first_row = tables[0].find_elements(By.XPATH, "./*[1]/*")
+
+        return len(first_row) >= 5
+
+    return check
+
+
+def _webdriver_cells(row: WebElement):
+    cells = []
+    for i, element in enumerate(row.find_elements(By.XPATH, "./*")):
+        cell = ActivityCell(element.text)
+
+        if i == 1:
+            try:
+                cell.image_url = element.find_element(By.XPATH, ".//img").get_attribute(
+                    "src"
+                )
+            except:
+                pass
+
+        elif (i == 3 and cell.text != "--") or (
+            i == 4 and cell.text not in ("--", "null address")
+        ):
+            cell.link_url = element.find_element(By.XPATH, "./a").get_attribute("href")
+
+        cells.append(cell)
+
+    return cells
+
+
+def scrape_activity(
+    driver: uc.Chrome,
+    url: str,
+    watermark: Optional[EventFingerprint],
+    selectors: Dict[str, str],
+    parse_mode: str,
+    ready_timeout: float,
+):
+    """
+    Opens the activity tab of a collection or wallet page and returns its events, newest first, up to the watermark.
+    Also returns how long the activity table took to get ready, or None if it never filled up (no activity).
+    """
+    wait = WebDriverWait(driver, ready_timeout, poll_frequency=0.1)
+    started = time.perf_counter()
+
+    driver.get(url)
+
+    wait.until(
+        expected_conditions.element_to_be_clickable(
+            (By.XPATH, selectors["ACTIVITY_TAB"])
+        )
+    ).click()
+
+    try:
+        wait.until(_activity_table_populated(selectors["ACTIVITY_TABLE"]))
+    except TimeoutException:
+        # Collections and wallets without any activity never get rows, parse whatever is there.
+        ready_seconds = None
+    else:
+        ready_seconds = time.perf_counter() - started
+
+    table = driver.find_element(By.XPATH, selectors["ACTIVITY_TABLE"])
+
+    events: List[ActivityEvent]
+    if parse_mode == "html":
+        events = parse_activity_table_html(
+            str(table.get_attribute("outerHTML")), url, watermark
+        )
+    else:
+        events = list(
+            until_watermark(
+                (
+                    event_from_cells(url, _webdriver_cells(row))
+                    for row in table.find_elements(By.XPATH, "./*")
+                ),
+                watermark,
+            )
+        )
+
+    return events, ready_seconds
@@ -0,0 +1,773 @@
+import os
+import sqlite3
+import tempfile
+from collections import OrderedDict, UserDict
+from typing import (
+    Any,
+    BinaryIO,
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    Literal,
+    Optional,
+    Tuple,
+    overload,
+)
+from urllib.parse import quote, unquote
+
+import orjson
+
+from internal_tools.events import ActivityEvent
+
+__all__ = [
+    "atomic_write",
+    "EventLog",
+    "ShardedEventLog",
+    "SqliteDatabase",
+    "SqliteEventLog",
+    "SqliteListenerSaver",
+]
+
+_SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    store TEXT NOT NULL,
+    target TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    event_type TEXT,
+    token_id TEXT,
+    price TEXT,
+    to_address TEXT,
+    from_address TEXT,
+    data BLOB NOT NULL,
+    PRIMARY KEY (store, target, position)
+);
+CREATE INDEX IF NOT EXISTS events_token_id ON events (store, token_id);
+CREATE INDEX IF NOT EXISTS events_price ON events (store, price);
+CREATE INDEX IF NOT EXISTS events_to_address ON events (to_address);
+CREATE INDEX IF NOT EXISTS events_from_address ON events (from_address);
+
+CREATE TABLE IF NOT EXISTS digests (
+    store TEXT NOT NULL,
+    target TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    digest TEXT NOT NULL,
+    PRIMARY KEY (store, target, position)
+);
+
+CREATE TABLE IF NOT EXISTS listeners (
+    store TEXT NOT NULL,
+    target TEXT NOT NULL,
+    guild_id INTEGER NOT NULL,
+    webhook_url TEXT NOT NULL,
+    PRIMARY KEY (store, target, guild_id)
+);
+CREATE INDEX IF NOT EXISTS listeners_guild_id ON listeners (guild_id);
+"""
+
+
+def atomic_write(filename: str, content: bytes):
+    """
+    Writes to a temporary file first and swaps it in, so a crash never leaves a half written file behind.
+    """
+    # Unique temp name, several processes or threads can write the same file at once.
+    fd, temp_filename = tempfile.mkstemp(
+        prefix=os.path.basename(filename) + ".",
+        suffix=".tmp",
+        dir=os.path.dirname(filename) or ".",
+    )
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(content)
+            f.flush()
+            os.fsync(f.fileno())
+
+        os.replace(temp_filename, filename)
+    except:
+        try:
+            os.remove(temp_filename)
+        except OSError:
+            pass
+
+        raise
+
+
+class EventLog:
+    """
+    Lists per target (events, digests, ...) that only ever get appended to, trimmed at the front or replaced.
+    Changes are appended to a log file instead of rewriting everything, a snapshot of the whole state gets written
+    once the log has compact_after_records entries (or when compact is called) and the log starts over.
+
+    Every log record has a sequence number and the snapshot knows the last one it contains,
+    so loading after a crash at any point gives back the last written state. A cut off last record is ignored.
+
+    Items are kept as they are in memory and go through encode before being written and decode after being read, if given.
+    decode_legacy decodes a whole list of the plain json file, instead of decode going through it item by item.
+    Without keep_open the log file is only opened while writing to it, for when lots of EventLogs are loaded at once.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        compact_after_records: int = 10000,
+        encode: Optional[Callable[[Any], Any]] = None,
+        decode: Optional[Callable[[Any], Any]] = None,
+        keep_open: bool = True,
+        decode_legacy: Optional[Callable[[List[Any]], List[Any]]] = None,
+    ) -> None:
+        os.makedirs("data", exist_ok=True)
+
+        self.snapshot_filename = f"data/{name}.snapshot.json"
+        self.log_filename = f"data/{name}.log.jsonl"
+        self.legacy_filename = f"data/{name}.json"
+        self.compact_after_records = compact_after_records
+        self.encode = encode
+        self.decode = decode
+        self.decode_legacy = decode_legacy
+
+        self.data: Dict[str, List[Any]] = {}
+        self._sequence = 0
+        self._log_records = 0
+
+        needs_compaction = self._load()
+
+        self._log: Optional[BinaryIO] = None
+        if keep_open:
+            self._log = open(self.log_filename, "ab")
+
+        if needs_compaction:
+            self.compact()
+
+    def _load(self):
+        """
+        Reads the snapshot and replays the log on top of it. Returns True if the files should be compacted right away.
+        """
+        needs_compaction = False
+
+        if os.path.exists(self.snapshot_filename):
+            with open(self.snapshot_filename, "rb") as f:
+                snapshot = orjson.loads(f.read())
+
+            self.data = {
+                target: self._decode(items)
+                for target, items in snapshot["targets"].items()
+            }
+            self._sequence = snapshot["sequence"]
+
+        elif os.path.exists(self.legacy_filename):
+            # Data from before the log existed, a plain json file with all lists in it.
+            with open(self.legacy_filename, "rb") as f:
+                self.data = {
+                    target: (
+                        self._decode(items)
+                        if self.decode_legacy == None
+                        else self.decode_legacy(items)
+                    )
+                    for target, items in orjson.loads(f.read()).items()
+                }
+
+            needs_compaction = True
+
+        if not os.path.exists(self.log_filename):
+            return needs_compaction
+
+        with open(self.log_filename, "rb") as f:
+            content = f.read()
+
+        position = 0
+        while position < len(content):
+            end = content.find(b"\n", position)
+            if end == -1:
+                break  # Last record was cut off while writing
+
+            try:
+                sequence, target, operation, payload = orjson.loads(
+                    content[position:end]
+                )
+            except orjson.JSONDecodeError:
+                break
+
+            if sequence > self._sequence:
+                if operation in ("append", "set"):
+                    payload = self._decode(payload)
+
+                self._apply(target, operation, payload)
+                self._sequence = sequence
+
+            self._log_records += 1
+            position = end + 1
+
+        if position < len(content):
+            with open(self.log_filename, "r+b") as f:
+                f.truncate(position)
+
+        return needs_compaction
+
+    def _encode(self, items: List[Any]):
+        if self.encode == None:
+            return items
+
+        return [self.encode(item) for item in items]
+
+    def _decode(self, items: List[Any]):
+        if self.decode == None:
+            return items
+
+        return [self.decode(item) for item in items]
+
+    def _apply(self, target: str, operation: str, payload: Any):
+        if operation == "append":
+            self.data.setdefault(target, []).extend(payload)
+        elif operation == "set":
+            self.data[target] = payload
+        elif operation == "trim":
+            self.data[target] = self.data.get(target, [])[payload:]
+        elif operation == "delete":
+            self.data.pop(target, None)
+        else:
+            raise ValueError(f"Unknown event log operation '{operation}'")
+
+    def _record(self, target: str, operation: str, payload: Any = None):
+        self._apply(target, operation, payload)
+
+        if operation in ("append", "set"):
+            payload = self._encode(payload)
+
+        self._sequence += 1
+        record = orjson.dumps([self._sequence, target, operation, payload]) + b"\n"
+        if self._log != None:
+            self._log.write(record)
+            self._log.flush()
+        else:
+            with open(self.log_filename, "ab") as log:
+                log.write(record)
+
+        self._log_records += 1
+        if self._log_records >= self.compact_after_records:
+            self.compact()
+
+    def __contains__(self, target: str):
+        return target in self.data
+
+    def __getitem__(self, target: str):
+        return self.data[target]
+
+    @overload
+    def get(self, target: str, default: None = None) -> Optional[List[Any]]: ...
+
+    @overload
+    def get(self, target: str, default: List[Any]) -> List[Any]: ...
+
+    def get(self, target: str, default: Optional[List[Any]] = None):
+        return self.data.get(target, default)
+
+    def items(self):
+        return self.data.items()
+
+    def append(self, target: str, items: List[Any]):
+        if items:
+            self._record(target, "append", items)
+
+    def set(self, target: str, items: List[Any]):
+        self._record(target, "set", items)
+
+    def trim(self, target: str, count: int):
+        """
+        Drops the first count items of a target.
+        """
+        if count > 0:
+            self._record(target, "trim", count)
+
+    def delete(self, target: str):
+        if target in self.data:
+            self._record(target, "delete")
+
+    def compact(self):
+        """
+        Writes a snapshot of the current state and empties the log.
+        """
+        atomic_write(
+            self.snapshot_filename,
+            orjson.dumps(
+                {
+                    "sequence": self._sequence,
+                    "targets": {
+                        target: self._encode(items)
+                        for target, items in self.data.items()
+                    },
+                }
+            ),
+        )
+
+        if self._log != None:
+            self._log.close()
+            self._log = open(self.log_filename, "wb")
+        else:
+            open(self.log_filename, "wb").close()
+        self._log_records = 0
+
+        if os.path.exists(self.legacy_filename):
+            os.remove(self.legacy_filename)
+
+    def close(self):
+        if self._log != None:
+            self._log.close()
+
+
+class ShardedEventLog:
+    """
+    Same interface as EventLog, but every target gets its own EventLog in data/{name}/, loaded the first time it is used.
+    At most max_loaded_targets stay in memory, the least recently used one gets closed when another one is needed.
+    Shards dont keep their log files open, so the number of loaded targets isnt limited by the open file limit.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        compact_after_records: int = 10000,
+        encode: Optional[Callable[[Any], Any]] = None,
+        decode: Optional[Callable[[Any], Any]] = None,
+        max_loaded_targets: int = 1000,
+        decode_legacy: Optional[Callable[[List[Any]], List[Any]]] = None,
+    ) -> None:
+        self.name = name
+        self.directory = f"data/{name}"
+        self.compact_after_records = compact_after_records
+        self.encode = encode
+        self.decode = decode
+        self.max_loaded_targets = max_loaded_targets
+        self.decode_legacy = decode_legacy
+
+        os.makedirs(self.directory, exist_ok=True)
+
+        self._loaded: "OrderedDict[str, EventLog]" = OrderedDict()
+
+        self._import_single_file_log()
+
+    def _import_single_file_log(self):
+        """
+        Splits up the single EventLog (or plain json file) every target used to share.
+        """
+        filenames = [
+            f"data/{self.name}.snapshot.json",
+            f"data/{self.name}.log.jsonl",
+            f"data/{self.name}.json",
+        ]
+        if not any(os.path.exists(filename) for filename in filenames):
+            return
+
+        single_file_log = EventLog(
+            self.name,
+            self.compact_after_records,
+            self.encode,
+            self.decode,
+            decode_legacy=self.decode_legacy,
+        )
+        for target, items in single_file_log.items():
+            shard = self._shard(target, create=True)
+            shard.set(target, items)
+            shard.compact()
+
+        single_file_log.close()
+
+        for filename in filenames:
+            if os.path.exists(filename):
+                os.remove(filename)
+
+    def _shard_filename(self, target: str):
+        return f"{self.directory}/{quote(target, safe='')}"
+
+    def _shard_exists(self, target: str):
+        filename = self._shard_filename(target)
+
+        return os.path.exists(filename + ".snapshot.json") or os.path.exists(
+            filename + ".log.jsonl"
+        )
+
+    @overload
+    def _shard(self, target: str) -> Optional[EventLog]: ...
+
+    @overload
+    def _shard(self, target: str, create: Literal[True]) -> EventLog: ...
+
+    def _shard(self, target: str, create: bool = False) -> Optional[EventLog]:
+        shard = self._loaded.get(target)
+        if shard != None:
+            self._loaded.move_to_end(target)
+            return shard
+
+        if not create and not self._shard_exists(target):
+            return None
+
+        shard = EventLog(
+            f"{self.name}/{quote(target, safe='')}",
+            self.compact_after_records,
+            self.encode,
+            self.decode,
+            keep_open=False,
+        )
+        self._loaded[target] = shard
+
+        while len(self._loaded) > self.max_loaded_targets:
+            _, evicted = self._loaded.popitem(last=False)
+            evicted.close()
+
+        return shard
+
+    def targets(self):
+        targets = set()
+        for filename in os.listdir(self.directory):
+            for suffix in (".snapshot.json", ".log.jsonl"):
+                if filename.endswith(suffix):
+                    targets.add(unquote(filename[: -len(suffix)]))
+
+        return sorted(targets)
+
+    def __contains__(self, target: str):
+        shard = self._shard(target)
+
+        return shard != None and target in shard
+
+    def __getitem__(self, target: str):
+        shard = self._shard(target)
+        if shard == None:
+            raise KeyError(target)
+
+        return shard[target]
+
+    @overload
+    def get(self, target: str, default: None = None) -> Optional[List[Any]]: ...
+
+    @overload
+    def get(self, target: str, default: List[Any]) -> List[Any]: ...
+
+    def get(self, target: str, default: Optional[List[Any]] = None):
+        shard = self._shard(target)
+        if shard == None:
+            return default
+
+        return shard.get(target, default)
+
+    def items(self) -> Iterator[Tuple[str, List[Any]]]:
+        """
+        Loads the targets one after another, so going through all of them doesnt keep all of them in memory.
+        """
+        for target in self.targets():
+            items = self.get(target)
+            if items != None:
+                yield target, items
+
+    def append(self, target: str, items: List[Any]):
+        if items:
+            self._shard(target, create=True).append(target, items)
+
+    def set(self, target: str, items: List[Any]):
+        self._shard(target, create=True).set(target, items)
+
+    def trim(self, target: str, count: int):
+        """
+        Drops the first count items of a target.
+        """
+        shard = self._shard(target)
+        if shard != None:
+            shard.trim(target, count)
+
+    def delete(self, target: str):
+        shard = self._loaded.pop(target, None)
+        if shard != None:
+            shard.close()
+
+        filename = self._shard_filename(target)
+        for suffix in (".snapshot.json", ".log.jsonl"):
+            if os.path.exists(filename + suffix):
+                os.remove(filename + suffix)
+
+    def targets_to_compact(self):
+        """
+        Targets with changes in their log. Found from the sizes of the log files, without loading any target.
+        """
+        targets = []
+        for target in self.targets():
+            try:
+                if os.path.getsize(self._shard_filename(target) + ".log.jsonl") > 0:
+                    targets.append(target)
+            except OSError:
+                pass
+
+        return targets
+
+    def compact_target(self, target: str):
+        shard = self._shard(target)
+        if shard != None:
+            shard.compact()
+
+    def compact(self):
+        """
+        Writes fresh snapshots of every target that has changes in its log.
+        """
+        for target in self.targets_to_compact():
+            self.compact_target(target)
+
+    def close(self):
+        for shard in self._loaded.values():
+            shard.close()
+
+        self._loaded.clear()
+
+
+class SqliteDatabase:
+    """
+    The SQLite file the sqlite storage engine keeps events, digests and listeners in. Runs in WAL mode.
+    """
+
+    def __init__(self, filename: str) -> None:
+        self.connection = sqlite3.connect(filename)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.executescript(_SQLITE_SCHEMA)
+
+    def close(self):
+        self.connection.close()
+
+
+class SqliteEventLog:
+    """
+    Same interface as EventLog, backed by the events or digests table of a SqliteDatabase.
+    Targets are loaded the first time they are used and the least recently used ones dropped from memory
+    once more than max_loaded_targets are loaded. Every change is one transaction.
+    """
+
+    def __init__(
+        self,
+        database: SqliteDatabase,
+        store: str,
+        table: Literal["events", "digests"],
+        max_loaded_targets: int = 1000,
+    ) -> None:
+        self.connection = database.connection
+        self.store = store
+        self.table = table
+        self.max_loaded_targets = max_loaded_targets
+
+        self._cache: "OrderedDict[str, List[Any]]" = OrderedDict()
+
+    def _cache_items(self, target: str, items: List[Any]):
+        self._cache[target] = items
+        self._cache.move_to_end(target)
+
+        while len(self._cache) > self.max_loaded_targets:
+            self._cache.popitem(last=False)
+
+    def _rows(self, target: str, items: List[Any], first_position: int):
+        for position, item in enumerate(items, start=first_position):
+            if self.table == "events":
+                yield (
+                    self.store,
+                    target,
+                    position,
+                    item.event_type,
+                    item.token_id,
+                    item.price,
+                    item.to_address,
+                    item.from_address,
+                    orjson.dumps(item.to_record()),
+                )
+            else:
+                yield (self.store, target, position, item)
+
+    def _insert(self, target: str, items: List[Any], first_position: int):
+        if self.table == "events":
+            query = "INSERT INTO events VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)"
+        else:
+            query = "INSERT INTO digests VALUES (?, ?, ?, ?)"
+
+        self.connection.executemany(query, self._rows(target, items, first_position))
+
+    def _load(self, target: str):
+        column = "data" if self.table == "events" else "digest"
+        cursor = self.connection.execute(
+            f"SELECT {column} FROM {self.table} WHERE store = ? AND target = ? ORDER BY position",
+            (self.store, target),
+        )
+
+        if self.table == "events":
+            return [ActivityEvent.from_record(orjson.loads(row[0])) for row in cursor]
+        else:
+            return [row[0] for row in cursor]
+
+    def _targets(self) -> Iterator[str]:
+        cursor = self.connection.execute(
+            f"SELECT DISTINCT target FROM {self.table} WHERE store = ?", (self.store,)
+        )
+        for row in cursor.fetchall():
+            yield row[0]
+
+    def __contains__(self, target: str):
+        if target in self._cache:
+            return True
+
+        return (
+            self.connection.execute(
+                f"SELECT 1 FROM {self.table} WHERE store = ? AND target = ? LIMIT 1",
+                (self.store, target),
+            ).fetchone()
+            != None
+        )
+
+    def __getitem__(self, target: str):
+        if target not in self:
+            raise KeyError(target)
+
+        return self.get(target, [])
+
+    @overload
+    def get(self, target: str, default: None = None) -> Optional[List[Any]]: ...
+
+    @overload
+    def get(self, target: str, default: List[Any]) -> List[Any]: ...
+
+    def get(self, target: str, default: Optional[List[Any]] = None):
+        if target in self._cache:
+            self._cache.move_to_end(target)
+            return self._cache[target]
+
+        items = self._load(target)
+        if not items:
+            return default
+
+        self._cache_items(target, items)
+
+        return items
+
+    def items(self) -> Iterator[Tuple[str, List[Any]]]:
+        for target in list(self._targets()):
+            yield target, self.get(target, [])
+
+    def _last_position(self, target: str) -> int:
+        row = self.connection.execute(
+            f"SELECT MAX(position) FROM {self.table} WHERE store = ? AND target = ?",
+            (self.store, target),
+        ).fetchone()
+
+        return -1 if row[0] == None else row[0]
+
+    def append(self, target: str, items: List[Any]):
+        if not items:
+            return
+
+        known_items = self.get(target)
+        with self.connection:
+            self._insert(target, items, self._last_position(target) + 1)
+
+        if known_items == None:
+            self._cache_items(target, list(items))
+        else:
+            known_items.extend(items)
+
+    def set(self, target: str, items: List[Any]):
+        with self.connection:
+            self.connection.execute(
+                f"DELETE FROM {self.table} WHERE store = ? AND target = ?",
+                (self.store, target),
+            )
+            self._insert(target, items, 0)
+
+        self._cache_items(target, list(items))
+
+    def trim(self, target: str, count: int):
+        """
+        Drops the first count items of a target.
+        """
+        if count <= 0:
+            return
+
+        with self.connection:
+            self.connection.execute(
+                f"""DELETE FROM {self.table} WHERE store = ? AND target = ? AND position IN (
+                    SELECT position FROM {self.table} WHERE store = ? AND target = ? ORDER BY position LIMIT ?
+                )""",
+                (self.store, target, self.store, target, count),
+            )
+
+        if target in self._cache:
+            self._cache[target] = self._cache[target][count:]
+
+    def delete(self, target: str):
+        with self.connection:
+            self.connection.execute(
+                f"DELETE FROM {self.table} WHERE store = ? AND target = ?",
+                (self.store, target),
+            )
+
+        self._cache.pop(target, None)
+
+    def compact(self):
+        """
+        Moves the write ahead log back into the database file.
+        """
+        self.connection.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+    def close(self):
+        self._cache.clear()
+
+
+class SqliteListenerSaver(UserDict):
+    """
+    Same interface as the JsonDictSaver of a listener store ({target: {guild_id: webhook_url}}),
+    backed by the listeners table of a SqliteDatabase. save only writes what changed since the last save.
+    """
+
+    def __init__(self, database: SqliteDatabase, store: str) -> None:
+        super().__init__()
+
+        self.connection = database.connection
+        self.store = store
+
+        for target, guild_id, webhook_url in self.connection.execute(
+            "SELECT target, guild_id, webhook_url FROM listeners WHERE store = ?",
+            (store,),
+        ):
+            self.data.setdefault(target, {})[guild_id] = webhook_url
+
+        self._saved = self._rows()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, type, value, traceback):
+        self.save()
+
+    def _rows(self) -> Dict[Tuple[str, int], str]:
+        return {
+            (target, guild_id): webhook_url
+            for target, listeners in self.data.items()
+            for guild_id, webhook_url in listeners.items()
+        }
+
+    def save(self):
+        rows = self._rows()
+
+        with self.connection:
+            self.connection.executemany(
+                "DELETE FROM listeners WHERE store = ? AND target = ? AND guild_id = ?",
+                [(self.store, *key) for key in self._saved if key not in rows],
+            )
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO listeners VALUES (?, ?, ?, ?)",
+                [
+                    (self.store, *key, webhook_url)
+                    for key, webhook_url in rows.items()
+                    if self._saved.get(key) != webhook_url
+                ],
+            )
+
+        self._saved = rows
+
+    async def save_async(self):
+        # Only writes the changed rows, small enough to stay on the loop and keep the connection on one thread.
+        self.save()
+
+    def flush(self):
+        """
+        Nothing to do, save already commits.
+        """
@@ -0,0 +1,248 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+import traceback
+from multiprocessing.connection import Connection
+from typing import Any, Dict, List, Optional, Tuple
+
+import psutil
+
+from internal_tools.alto import EventFingerprint
+from internal_tools.browser import BrowserPool
+from internal_tools.events import ActivityEvent
+from internal_tools.scraping import scrape_activity
+
+__all__ = ["ScrapeWorkerPool"]
+
+ScrapeResult = Tuple[List[ActivityEvent], Optional[float], Optional[str]]
+
+
+def _worker_main(connection: Connection, settings: Dict[str, Any]):
+    """
+    Runs in the worker process. Keeps one browser alive and scrapes whatever the bot process sends.
+    """
+    logging.basicConfig(filename="scrape_workers.log", level=logging.INFO)
+
+    pool = BrowserPool(
+        1,
+        settings["MAX_PAGES_PER_WORKER"],
+        lean=settings["LEAN_PROFILE"]["ENABLED"],
+        blocked_url_patterns=settings["LEAN_PROFILE"]["BLOCKED_URL_PATTERNS"],
+        driver_executable_path=settings["DRIVER_EXECUTABLE_PATH"],
+        profile_directory=settings["PROFILE_DIRECTORY"],
+        max_profile_mb=settings["MAX_PROFILE_MB"],
+    )
+    try:
+        while True:
+            try:
+                job = connection.recv()
+            except EOFError:
+                break
+
+            if job == None:
+                break
+
+            url, watermark = job
+            try:
+                with pool.browser() as driver:
+                    events, ready_seconds = scrape_activity(
+                        driver,
+                        url,
+                        watermark,
+                        settings["SELECTORS"],
+                        settings["PARSE_MODE"],
+                        settings["PAGE_READY_TIMEOUT_SECONDS"],
+                    )
+            except Exception as e:
+                # Selenium exceptions dont always survive pickling, send the traceback instead.
+                text = "".join(traceback.format_exception(type(e), e, e.__traceback__))
+                connection.send(([], None, text))
+            else:
+                connection.send((events, ready_seconds, None))
+    finally:
+        pool.close()
+
+
+class _Worker:
+    def __init__(self, context, settings: Dict[str, Any], slot: int) -> None:
+        if settings["PROFILE_DIRECTORY"] != None:
+            # Every worker needs its own profiles, two browsers cant share one.
+            settings = dict(
+                settings,
+                PROFILE_DIRECTORY=os.path.join(
+                    settings["PROFILE_DIRECTORY"], str(slot)
+                ),
+            )
+
+        self.connection, child_connection = context.Pipe()
+        self.process = context.Process(
+            target=_worker_main, args=(child_connection, settings), daemon=True
+        )
+        self.process.start()
+        child_connection.close()
+
+        self.slot = slot
+        self.pages = 0
+
+    def run(self, job: Tuple[str, Optional[EventFingerprint]], timeout: float):
+        self.connection.send(job)
+        if not self.connection.poll(timeout):
+            raise TimeoutError(f"Scraping {job[0]} took longer than {timeout}s")
+
+        result: ScrapeResult = self.connection.recv()
+        self.pages += 1
+
+        return result
+
+    def rss(self):
+        """
+        Memory of the worker and the browser processes it started, in bytes.
+        """
+        try:
+            process = psutil.Process(self.process.pid)
+            return sum(
+                p.memory_info().rss
+                for p in [process] + process.children(recursive=True)
+            )
+        except psutil.Error:
+            return 0
+
+    def kill(self):
+        try:
+            process = psutil.Process(self.process.pid)
+            for child in process.children(recursive=True):
+                child.kill()
+        except psutil.Error:
+            pass
+
+        self.process.kill()
+        self.process.join()
+        self.connection.close()
+
+    def stop(self):
+        try:
+            self.connection.send(None)
+        except:
+            pass
+
+        self.process.join(30)
+        if self.process.is_alive():
+            self.kill()
+        else:
+            self.connection.close()
+
+
+class ScrapeWorkerPool:
+    """
+    Scrapes in separate processes that each hold their own browser, so a leaking or hanging browser cant stall the bot.
+    Workers get replaced after a set amount of pages, when they use too much memory, or when a scrape hits the timeout.
+    """
+
+    def __init__(
+        self,
+        size: int,
+        max_pages_per_worker: int,
+        max_rss_mb: float,
+        timeout: float,
+        settings: Dict[str, Any],
+    ) -> None:
+        self.size = size
+        self.max_pages_per_worker = max_pages_per_worker
+        self.max_rss = max_rss_mb * 1024 * 1024
+        self.timeout = timeout
+        self.settings = settings
+
+        self._context = multiprocessing.get_context("spawn")
+        self._idle: List[_Worker] = []
+        self._free_slots = list(range(size))
+        self._freed = asyncio.Condition()
+        self._closed = False
+
+    async def _acquire(self):
+        async with self._freed:
+            while not self._idle and not self._free_slots:
+                await self._freed.wait()
+
+            if self._idle:
+                return self._idle.pop()
+
+            slot = self._free_slots.pop()
+
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(
+                None, _Worker, self._context, self.settings, slot
+            )
+        except:
+            await self._free_slot(slot)
+            raise
+
+    async def _free_slot(self, slot: int):
+        async with self._freed:
+            self._free_slots.append(slot)
+            self._freed.notify()
+
+    async def _drop(self, worker: _Worker, kill: bool = False):
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, worker.kill if kill else worker.stop)
+
+        await self._free_slot(worker.slot)
+
+    async def _release(self, worker: _Worker):
+        if self._closed or worker.pages >= self.max_pages_per_worker:
+            await self._drop(worker)
+            return
+
+        # Walks the whole browser process tree, too slow for the event loop.
+        rss = await asyncio.get_running_loop().run_in_executor(None, worker.rss)
+        if self._closed or rss > self.max_rss:
+            await self._drop(worker)
+            return
+
+        async with self._freed:
+            self._idle.append(worker)
+            self._freed.notify()
+
+    async def scrape(
+        self, url: str, watermark: Optional[EventFingerprint] = None
+    ) -> ScrapeResult:
+        """
+        Scrapes the activity table of a page in a worker.
+        Returns the events (newest first), the time the table took to get ready and the error text if it failed.
+        """
+        if self._closed:
+            raise RuntimeError("Scrape worker pool is closed")
+
+        worker = await self._acquire()
+
+        loop = asyncio.get_running_loop()
+        try:
+            result = await loop.run_in_executor(
+                None, worker.run, (url, watermark), self.timeout
+            )
+        except BaseException:
+            # Timed out, the worker died or we got cancelled, the worker cant be trusted to be idle anymore.
+            await asyncio.shield(self._drop(worker, kill=True))
+            raise
+
+        await self._release(worker)
+
+        return result
+
+    def close(self):
+        """
+        Stops the idle workers in an executor, busy ones get stopped once their scrape is done.
+        """
+        self._closed = True
+
+        idle, self._idle = self._idle, []
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            for worker in idle:
+                worker.stop()  # No event loop to keep responsive
+            return
+
+        for worker in idle:
+            loop.run_in_executor(None, worker.stop)
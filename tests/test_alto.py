@@ -0,0 +1,199 @@
+import os
+import unittest
+
+import aiohttp
+import orjson
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from internal_tools.alto import (
+    ActivityCell,
+    event_fingerprint,
+    event_from_cells,
+    fetch_activity_http,
+    parse_activity_table_html,
+)
+
+URL = "https://alto.build/collections/test"
+
+with open(
+    os.path.join(os.path.dirname(__file__), "fixtures", "activity_table.html"),
+    encoding="utf-8",
+) as f:
+    ACTIVITY_TABLE = f.read()
+
+# What the webdriver parse mode reads from the fixture: WebElement.text of every cell
+# (block elements on their own line, hidden elements left out) and the resolved src and href attributes.
+RENDERED_ROWS = [
+    [
+        ActivityCell("Sale"),
+        ActivityCell(
+            "17",
+            image_url="https://alto.build/_next/image?url=%2Ftokens%2F17.png&w=64",
+        ),
+        ActivityCell("1.5CANTO"),
+        ActivityCell("0xabc...abc", link_url="https://alto.build/profile/0xabc"),
+        ActivityCell("0xdef...def", link_url="https://alto.build/profile/0xdef"),
+        ActivityCell("2 minutes ago"),
+    ],
+    [
+        ActivityCell("Listing"),
+        ActivityCell("18", image_url="https://cdn.alto.build/tokens/18.png"),
+        ActivityCell("250\nCANTO"),
+        ActivityCell("--"),
+        ActivityCell("0xdef...def", link_url="https://alto.build/profile/0xdef"),
+        ActivityCell("5 minutes ago"),
+    ],
+    [
+        ActivityCell("Mint"),
+        ActivityCell("19", image_url="https://cdn.alto.build/tokens/19.png"),
+        ActivityCell("--"),
+        ActivityCell("0x123...123", link_url="https://alto.build/profile/0x123"),
+        ActivityCell("null address"),
+        ActivityCell("1 hour ago"),
+    ],
+]
+
+
+class ParseModeParityTest(unittest.TestCase):
+    def test_html_matches_webdriver(self):
+        html_events = parse_activity_table_html(ACTIVITY_TABLE, URL)
+        webdriver_events = [event_from_cells(URL, row) for row in RENDERED_ROWS]
+
+        self.assertEqual(
+            [event.to_record() for event in html_events],
+            [event.to_record() for event in webdriver_events],
+        )
+
+    def test_records(self):
+        self.assertEqual(
+            [
+                event_fingerprint(event)
+                for event in parse_activity_table_html(ACTIVITY_TABLE, URL)
+            ],
+            [
+                ("Sale", "17", "1.5", "0xabc", "0xdef"),
+                ("Listing", "18", "250", None, "0xdef"),
+                ("Mint", "19", None, "0x123", None),
+            ],
+        )
+
+    def test_stops_at_watermark(self):
+        watermark = ("Listing", "18", "250", None, "0xdef")
+
+        self.assertEqual(
+            [
+                event.token_id
+                for event in parse_activity_table_html(ACTIVITY_TABLE, URL, watermark)
+            ],
+            ["17"],
+        )
+
+
+FIELDS = {
+    "EVENT_TYPE": "eventType",
+    "PREVIEW_IMAGE_URL": "token.image",
+    "TOKEN_ID": "tokenId",
+    "PRICE": "price",
+    "TO_ADDRESS": "to",
+    "FROM_ADDRESS": "from",
+}
+
+# Made up in the shape HTTP_FETCH.FIELDS expects, not recorded from Alto. Holds the same rows as the fixture table.
+PAYLOAD = {
+    "props": {
+        "pageProps": {
+            "collection": {"name": "test"},
+            "activity": [
+                {
+                    "eventType": "Sale",
+                    "tokenId": 17,
+                    "token": {"image": "/_next/image?url=%2Ftokens%2F17.png&w=64"},
+                    "price": "1.5 CANTO",
+                    "to": "/profile/0xabc",
+                    "from": "0xdef",
+                },
+                {
+                    "eventType": "Listing",
+                    "tokenId": "18",
+                    "token": {"image": "https://cdn.alto.build/tokens/18.png"},
+                    "price": " 250 ",
+                    "to": None,
+                    "from": "0xdef",
+                },
+                {
+                    "eventType": "Mint",
+                    "tokenId": "19",
+                    "token": {"image": "https://cdn.alto.build/tokens/19.png"},
+                    "price": "",
+                    "to": "0x123",
+                },
+            ],
+        }
+    }
+}
+
+
+def _page(payload: dict):
+    return (
+        '<html><body><div id="__next"></div><script id="__NEXT_DATA__" type="application/json">'
+        + orjson.dumps(payload).decode()
+        + "</script></body></html>"
+    )
+
+
+class FetchActivityHttpTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        async def collection(request: web.Request):
+            return web.Response(text=_page(PAYLOAD), content_type="text/html")
+
+        async def empty(request: web.Request):
+            return web.Response(text=_page({"props": {}}), content_type="text/html")
+
+        app = web.Application()
+        app.router.add_get("/collections/test", collection)
+        app.router.add_get("/collections/empty", empty)
+
+        self.server = TestServer(app)
+        await self.server.start_server()
+        self.session = aiohttp.ClientSession()
+
+    async def asyncTearDown(self):
+        await self.session.close()
+        await self.server.close()
+
+    async def test_matches_browser_fingerprints(self):
+        url = str(self.server.make_url("/collections/test"))
+
+        events = await fetch_activity_http(self.session, url, FIELDS, 5)
+
+        self.assertEqual(
+            [event_fingerprint(event) for event in events],
+            [event_fingerprint(event_from_cells(URL, row)) for row in RENDERED_ROWS],
+        )
+        self.assertEqual(
+            events[0].preview_image_url,
+            str(self.server.make_url("/")) + "_next/image?url=%2Ftokens%2F17.png&w=64",
+        )
+
+    async def test_stops_at_watermark(self):
+        url = str(self.server.make_url("/collections/test"))
+
+        events = await fetch_activity_http(
+            self.session, url, FIELDS, 5, ("Listing", "18", "250", None, "0xdef")
+        )
+
+        self.assertEqual([event.token_id for event in events], ["17"])
+
+    async def test_raises_without_activity(self):
+        with self.assertRaises(Exception):
+            await fetch_activity_http(
+                self.session,
+                str(self.server.make_url("/collections/empty")),
+                FIELDS,
+                5,
+            )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,167 @@
+import asyncio
+import time
+import unittest
+from typing import Dict, List, Tuple
+
+import aiohttp
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from internal_tools.delivery import WebhookDelivery, WebhookRejected
+
+
+class FakeWebhooks:
+    """
+    Answers webhook executes with the responses queued for each webhook (204 once they run out)
+    and keeps the time every request came in.
+    """
+
+    def __init__(self) -> None:
+        self.responses: Dict[str, List[web.Response]] = {}
+        self.requests: Dict[str, List[Tuple[float, dict]]] = {}
+
+    async def handle(self, request: web.Request):
+        webhook = request.match_info["webhook_id"]
+        self.requests.setdefault(webhook, []).append(
+            (time.monotonic(), await request.json())
+        )
+
+        responses = self.responses.get(webhook)
+        if responses:
+            return responses.pop(0)
+
+        return web.Response(status=204)
+
+
+def _rate_limited(retry_after: float, is_global: bool = False):
+    return web.json_response(
+        {
+            "message": "You are being rate limited.",
+            "retry_after": retry_after,
+            "global": is_global,
+        },
+        status=429,
+    )
+
+
+class WebhookDeliveryTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.webhooks = FakeWebhooks()
+
+        app = web.Application()
+        app.router.add_post("/api/webhooks/{webhook_id}/{token}", self.webhooks.handle)
+
+        self.server = TestServer(app)
+        await self.server.start_server()
+        self.session = aiohttp.ClientSession()
+
+        self.delivery = WebhookDelivery(lambda: self.session, 10, 3)
+
+    async def asyncTearDown(self):
+        self.delivery.close()
+        await self.session.close()
+        await self.server.close()
+
+    def url(self, webhook: str):
+        return str(self.server.make_url(f"/api/webhooks/{webhook}/token"))
+
+    async def test_delivers(self):
+        await self.delivery.send(self.url("1"), {"content": "hi"})
+
+        self.assertEqual(
+            [payload for _, payload in self.webhooks.requests["1"]], [{"content": "hi"}]
+        )
+
+    async def test_retries_after_429(self):
+        self.webhooks.responses["1"] = [_rate_limited(0.3)]
+
+        started = time.monotonic()
+        await self.delivery.send(self.url("1"), {"content": "hi"})
+
+        first, second = [at for at, _ in self.webhooks.requests["1"]]
+        self.assertGreaterEqual(second - first, 0.3)
+        self.assertGreaterEqual(time.monotonic() - started, 0.3)
+
+    async def test_429_only_delays_its_webhook(self):
+        self.webhooks.responses["1"] = [_rate_limited(0.5)]
+
+        slow = self.delivery.send(self.url("1"), {"content": "slow"})
+        await asyncio.sleep(0.05)
+
+        started = time.monotonic()
+        await self.delivery.send(self.url("2"), {"content": "fast"})
+        self.assertLess(time.monotonic() - started, 0.3)
+        self.assertFalse(slow.done())
+
+        await slow
+        self.assertEqual(len(self.webhooks.requests["1"]), 2)
+
+    async def test_global_429_pauses_every_webhook(self):
+        self.webhooks.responses["1"] = [_rate_limited(0.4, is_global=True)]
+
+        first = self.delivery.send(self.url("1"), {"content": "first"})
+        await asyncio.sleep(0.05)
+        limited_at = self.webhooks.requests["1"][0][0]
+
+        await self.delivery.send(self.url("2"), {"content": "second"})
+        await first
+
+        self.assertGreaterEqual(self.webhooks.requests["2"][0][0] - limited_at, 0.4)
+
+    async def test_waits_for_exhausted_bucket(self):
+        self.webhooks.responses["1"] = [
+            web.Response(
+                status=204,
+                headers={
+                    "X-RateLimit-Remaining": "0",
+                    "X-RateLimit-Reset-After": "0.3",
+                },
+            )
+        ]
+
+        await self.delivery.send(self.url("1"), {"content": "first"})
+        await self.delivery.send(self.url("1"), {"content": "second"})
+
+        first, second = [at for at, _ in self.webhooks.requests["1"]]
+        self.assertGreaterEqual(second - first, 0.3)
+
+    async def test_keeps_order_per_webhook(self):
+        self.webhooks.responses["1"] = [_rate_limited(0.1)]
+
+        await asyncio.gather(
+            *[self.delivery.send(self.url("1"), {"content": str(i)}) for i in range(5)]
+        )
+
+        self.assertEqual(
+            [payload["content"] for _, payload in self.webhooks.requests["1"]],
+            ["0", "0", "1", "2", "3", "4"],
+        )
+
+    async def test_rejected_message_isnt_retried(self):
+        self.webhooks.responses["1"] = [
+            web.json_response({"message": "Unknown Webhook", "code": 10015}, status=404)
+        ]
+
+        with self.assertRaises(WebhookRejected):
+            await self.delivery.send(self.url("1"), {"content": "hi"})
+
+        self.assertEqual(len(self.webhooks.requests["1"]), 1)
+
+    async def test_retries_server_errors(self):
+        self.webhooks.responses["1"] = [web.Response(status=502)]
+
+        await self.delivery.send(self.url("1"), {"content": "hi"})
+
+        self.assertEqual(len(self.webhooks.requests["1"]), 2)
+
+    async def test_gives_up_after_max_attempts(self):
+        self.webhooks.responses["1"] = [_rate_limited(0.05) for _ in range(3)]
+
+        with self.assertRaises(Exception):
+            await self.delivery.send(self.url("1"), {"content": "hi"})
+
+        self.assertEqual(len(self.webhooks.requests["1"]), 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,137 @@
+import os
+import tempfile
+import time
+import unittest
+
+import orjson
+
+from internal_tools.alto import event_fingerprint
+from internal_tools.events import ActivityEvent
+from internal_tools.history import EventHistory
+from internal_tools.storage import ShardedEventLog
+
+
+def _legacy_event(token_id: str, price: str):
+    # An event dict as the baseline scraper stored it.
+    return {
+        "EVENT_TYPE": "Sale",
+        "PREVIEW_IMAGE_URL": f"https://cdn.alto.build/tokens/{token_id}.png",
+        "TOKEN_ID": token_id,
+        "TOKEN_URL": "https://alto.build/profile/0xabc/" + token_id,
+        "PRICE": price,
+        "TO_ADDRESS": "0xabc",
+        "TO_ADDRESS_URL": "https://alto.build/profile/0xabc",
+        "FROM_ADDRESS": "0xdef",
+        "FROM_ADDRESS_URL": "https://alto.build/profile/0xdef",
+    }
+
+
+class InTempDirectory:
+    # The event logs write to data/ in the working directory.
+
+    def setUp(self):
+        self.previous_directory = os.getcwd()
+        self.directory = tempfile.TemporaryDirectory()
+        os.chdir(self.directory.name)
+        os.makedirs("data")
+
+    def tearDown(self):
+        os.chdir(self.previous_directory)
+        self.directory.cleanup()
+
+
+class LegacyImportTest(InTempDirectory, unittest.TestCase):
+    def test_unwraps_add_wallet_tuples(self):
+        # add-wallet stored the (events, error) tuple, the update loop appended new events behind it.
+        with open("data/wallet_events.json", "wb") as f:
+            f.write(
+                orjson.dumps(
+                    {
+                        "0xabc": [
+                            [_legacy_event("1", "10"), _legacy_event("2", "20")],
+                            None,
+                            _legacy_event("3", "30"),
+                        ],
+                        "0xdef": [[], None],
+                    }
+                )
+            )
+
+        history = EventHistory("wallet", 0, 0, 0, 10000, 1000)
+        try:
+            self.assertEqual(
+                [event_fingerprint(event) for event in history.events.get("0xabc", [])],
+                [
+                    ("Sale", "1", "10", "0xabc", "0xdef"),
+                    ("Sale", "2", "20", "0xabc", "0xdef"),
+                    ("Sale", "3", "30", "0xabc", "0xdef"),
+                ],
+            )
+            self.assertEqual(
+                history.events.get("0xabc", [])[0].page_url,
+                "https://alto.build/profile/0xabc",
+            )
+            self.assertEqual(history.events.get("0xdef", []), [])
+            self.assertFalse(os.path.exists("data/wallet_events.json"))
+        finally:
+            history.close()
+
+    def test_reads_plain_event_lists(self):
+        with open("data/collection_events.json", "wb") as f:
+            f.write(orjson.dumps({"test": [_legacy_event("1", "10")]}))
+
+        history = EventHistory("collection", 0, 0, 0, 10000, 1000)
+        try:
+            self.assertIn(("Sale", "1", "10", "0xabc", "0xdef"), history.known("test"))
+        finally:
+            history.close()
+
+
+def _event(token_id: str, seen_at=None):
+    return ActivityEvent(
+        "Sale",
+        None,
+        token_id,
+        "1",
+        "0xabc",
+        "0xdef",
+        "https://alto.build/collections/test",
+        seen_at,
+    )
+
+
+class CompactionTest(InTempDirectory, unittest.IsolatedAsyncioTestCase):
+    async def test_only_compacts_changed_targets(self):
+        history = EventHistory("collection", 0, 0, 0, 10000, 1000)
+        history.reset("a", [_event("1")])
+        history.reset("b", [_event("2")])
+
+        events = history.events
+        assert isinstance(events, ShardedEventLog)
+        events.compact_target("a")
+
+        self.assertEqual(events.targets_to_compact(), ["b"])
+
+        await history.compact()
+
+        self.assertEqual(events.targets_to_compact(), [])
+        history.close()
+
+    async def test_applies_age_limit_and_keeps_stamps(self):
+        history = EventHistory("collection", 0, 1, 0, 10000, 1000)
+        history.events.set("test", [_event("1", int(time.time()) - 3 * 24 * 60 * 60)])
+        history.events.append("test", [_event("2")])
+
+        await history.compact()
+        history.close()
+
+        history = EventHistory("collection", 0, 1, 0, 10000, 1000)
+        known_events = history.events.get("test", [])
+        self.assertEqual([event.token_id for event in known_events], ["2"])
+        self.assertNotEqual(known_events[0].seen_at, None)
+        self.assertIn(("Sale", "1", "1", "0xabc", "0xdef"), history.known("test"))
+        history.close()
+
+
+if __name__ == "__main__":
+    unittest.main()